@@ -1,22 +1,50 @@
 """Emoji 处理器"""
 
+import json
 import re
+import tarfile
+import tempfile
+import threading
+import time
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
+from itertools import groupby
 from pathlib import Path
-from typing import Dict, List, Optional
-from urllib.request import urlopen, Request
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import requests
 from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .styles import TextSegment
 
+# regex 可选：存在时按 Unicode 属性匹配 emoji
+try:
+    import regex
+    HAS_REGEX = True
+except ImportError:
+    HAS_REGEX = False
+    regex = None
+
 
 class EmojiHandler:
     """Emoji 处理器 - 使用 Twemoji (Twitter/X) CDN"""
     
-    # 更完整的 Emoji 正则表达式（覆盖 Unicode 15.0+）
-    PATTERN = re.compile(
+    # 基于 Unicode 属性的 Emoji 正则（需要 regex 模块），随 Unicode 版本自动覆盖新 emoji：
+    # 国旗（两个区域指示符）| 基础 emoji + 变体选择符/肤色修饰符，零宽连接符串联的组合 emoji 整体匹配
+    # 排除 U+2139 之前的文本符号（© ® ™ ‼ 等），与回退正则的覆盖范围保持一致
+    PROPERTY_PATTERN = (
+        r'\p{Regional_Indicator}{2}'
+        r'|[\p{Extended_Pictographic}\p{Emoji_Presentation}--[\x00-\u2138]]'
+        r'(?:[\uFE00-\uFE0F\U0001F3FB-\U0001F3FF]'
+        r'|\u200D[\p{Extended_Pictographic}\p{Emoji_Presentation}--[\x00-\u2138]]?)*'
+    )
+
+    # 更完整的 Emoji 正则表达式（覆盖 Unicode 15.0+），regex 模块不可用时回退使用
+    FALLBACK_PATTERN = re.compile(
         r"""
         (?:
             # 基础Emoji字符（核心区间）
@@ -36,8 +64,13 @@ class EmojiHandler:
         """,
         re.UNICODE | re.VERBOSE
     )
+
+    PATTERN = regex.compile(PROPERTY_PATTERN, regex.V1) if HAS_REGEX else FALLBACK_PATTERN
     
-    SEPARATOR_CHARS = '━─═—_-~·•'
+    SEPARATOR_CHARS = frozenset('━─═—_-~·•')
+
+    # 两种 emoji 正则能匹配的首字符均不低于此字符，低于它的文本可跳过正则扫描
+    EMOJI_MIN_CHAR = '\u2000'
     
     # Twemoji CDN 源
     CDN_BASES = [
@@ -45,9 +78,26 @@ class EmojiHandler:
         "https://twemoji.maxcdn.com/v/latest/72x72",
         "https://abs.twimg.com/emoji/v2/72x72",
     ]
+
+    HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+    # 批量下载时的最大并发数
+    DOWNLOAD_CONCURRENCY = 8
+
+    # Twemoji 固定版本发布包，开启预取后一次性解压全部 72x72 PNG
+    ARCHIVE_VERSION = "14.0.2"
+    ARCHIVE_URL = f"https://github.com/twitter/twemoji/archive/refs/tags/v{ARCHIVE_VERSION}.tar.gz"
+    ARCHIVE_DIR = "72x72"
+
+    # 失败缓存持久化文件名，及累计多少条新失败后落盘
+    FAILED_CACHE_FILE = "failed.json"
+    FAILED_FLUSH_EVERY = 5
+    # 目标尺寸超过该值时使用 LANCZOS 缩放，否则使用 BILINEAR
+    LANCZOS_MIN_SIZE = 64
     
     def __init__(self, font_dir: Path = None, cache_dir: Path = None, 
-                timeout: int = 10, failed_ttl: int = 3600):
+                timeout: int = 10, failed_ttl: int = 3600,
+                archive_prefetch: bool = False):
         """
         初始化 Emoji 处理器
         
@@ -56,10 +106,10 @@ class EmojiHandler:
             cache_dir: Emoji 磁盘缓存目录，默认为插件根目录下的 .emoji-cache
             timeout: 下载超时时间（秒），默认 10 秒
             failed_ttl: 失败缓存 TTL（秒），默认 3600 秒（1 小时）
+            archive_prefetch: 首次缓存未命中时后台下载 Twemoji 发布包并解压到缓存目录
         """
         from astrbot.api import logger
-        import time
-        
+
         # 确定缓存目录：使用传入的 cache_dir，否则使用插件根目录下的 .emoji-cache
         if cache_dir is None and font_dir is not None:
             cache_dir = font_dir.parent / ".emoji-cache"
@@ -72,59 +122,261 @@ class EmojiHandler:
 
         self._timeout = timeout
         self._failed_ttl = failed_ttl
-        self._cache: OrderedDict[str, Image.Image] = OrderedDict()
+        # 内存缓存保存 RGBA 原始字节与尺寸，取用时零拷贝包装为只读图片
+        self._cache: OrderedDict[str, Tuple[bytes, Tuple[int, int]]] = OrderedDict()
         self._cache_max_items = 512
-        # 失败缓存从 set 改为 Dict[str, float]，记录时间戳
-        self._failed: Dict[str, float] = {}
+        # 内存缓存会被渲染线程、下载线程池与 to_thread 解码线程同时读写
+        self._cache_lock = threading.Lock()
+        # 失败缓存从 set 改为 Dict[str, float]，记录时间戳；持久化到磁盘以跨重启生效
+        self._failed_file = self._cache_dir / self.FAILED_CACHE_FILE
+        self._failed: Dict[str, float] = self._load_failed_cache()
+        # 失败缓存同样会被多个下载/渲染线程并发读写
+        self._failed_lock = threading.Lock()
+        # 串行化失败缓存落盘：多个下载线程可能同时触发写入同一临时文件
+        self._flush_lock = threading.Lock()
+        self._failed_dirty = 0
         self._failed_cleanup_interval = max(120, min(self._failed_ttl, 3600))
         self._last_failed_cleanup = 0.0
+        self._session = self._create_session()
+        # 批量下载线程池：复用同一 HTTP 会话并发下载，同步调用与事件循环内调用均可使用
+        self._download_pool = ThreadPoolExecutor(max_workers=self.DOWNLOAD_CONCURRENCY,
+                                                 thread_name_prefix="emoji-download")
+
+        self._archive_prefetch = archive_prefetch
+        self._archive_dir = self._cache_dir / self.ARCHIVE_DIR
+        self._archive_marker = self._archive_dir / f".v{self.ARCHIVE_VERSION}"
+        self._archive_ready = self._archive_marker.exists()
+        self._archive_started = False
+        self._archive_running = False
+        self._archive_lock = threading.Lock()
+        self._closed = False
+        # 正在下载的 emoji（key -> Future），并发请求同一 emoji 时等待同一结果
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """创建复用连接的 HTTP 会话，避免每个 emoji 重新握手"""
+        session = requests.Session()
+        session.headers.update(self.HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=len(self.CDN_BASES),
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.3),
+        )
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        """落盘失败缓存，关闭下载线程池与 HTTP 会话
+
+        会等待线程池中的下载结束，调用方应在事件循环之外调用；
+        发布包仍在后台预取时，HTTP 会话由预取线程结束后自行关闭。
+        """
+        self._download_pool.shutdown(wait=True)
+        if self._failed_dirty:
+            self._flush_failed_cache()
+        with self._archive_lock:
+            self._closed = True
+            if self._archive_running:
+                return
+        self._session.close()
+
+    def _load_failed_cache(self) -> Dict[str, float]:
+        """加载磁盘失败缓存，丢弃已过 TTL 的记录"""
+        from astrbot.api import logger
+
+        if not self._failed_file.exists():
+            return {}
+        try:
+            with open(self._failed_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"[Emoji] 失败缓存读取失败: {self._failed_file} - {e}")
+            return {}
+
+        if not isinstance(data, dict):
+            logger.warning(f"[Emoji] 失败缓存格式无效，已忽略: {self._failed_file}")
+            return {}
+
+        now = time.time()
+        failed: Dict[str, float] = {}
+        for emoji, ts in data.items():
+            try:
+                ts = float(ts)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(emoji, str) and now - ts < self._failed_ttl:
+                failed[emoji] = ts
+        return failed
+
+    def _flush_failed_cache(self):
+        """将失败缓存写入磁盘（先写临时文件再替换，避免写坏）"""
+        from astrbot.api import logger
+
+        # 快照与写入在同一把锁内完成，后写入的总是更新的快照
+        with self._flush_lock:
+            with self._failed_lock:
+                self._failed_dirty = 0
+                snapshot = dict(self._failed)
+            tmp_path = self._failed_file.with_suffix(".tmp")
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                tmp_path.replace(self._failed_file)
+            except Exception as e:
+                logger.warning(f"[Emoji] 失败缓存写入失败: {self._failed_file} - {e}")
     
     def split_text(self, text: str) -> List[TextSegment]:
         """将文本拆分为普通文字和 emoji"""
-        result = []
+        return [TextSegment(text=text[start:end], is_emoji=is_emoji, no_wrap=no_wrap)
+                for start, end, is_emoji, no_wrap in self.split_text_spans(text)]
+
+    def split_text_spans(self, text: str) -> List[Tuple[int, int, bool, bool]]:
+        """扫描文本中的 emoji 与连续分隔符，只返回区间，由调用方按需切片
+
+        Returns:
+            [(起点, 终点, 是否 emoji, 是否不换行的分隔符)]
+        """
+        spans: List[Tuple[int, int, bool, bool]] = []
+        if not text:
+            return spans
+
+        # ASCII / 拉丁文等不含高位字符的文本（代码、URL 等常见情形）无需运行 emoji 正则
+        if max(text) < self.EMOJI_MIN_CHAR:
+            self._separator_spans(text, 0, len(text), spans)
+            return spans
+
         last_end = 0
-        
         for match in self.PATTERN.finditer(text):
-            # 添加 emoji 之前的普通文本
-            if match.start() > last_end:
-                plain = text[last_end:match.start()]
-                result.extend(self._split_separators(plain))
-            
-            # 添加 emoji
-            result.append(TextSegment(text=match.group(), is_emoji=True))
-            last_end = match.end()
-        
-        # 添加最后的普通文本
+            start, end = match.span()
+            # emoji 之前的普通文本
+            if start > last_end:
+                self._separator_spans(text, last_end, start, spans)
+            spans.append((start, end, True, False))
+            last_end = end
+
+        # 最后的普通文本
         if last_end < len(text):
-            result.extend(self._split_separators(text[last_end:]))
-        
-        return result
+            self._separator_spans(text, last_end, len(text), spans)
+        return spans
+
+    def _separator_spans(self, text: str, start: int, end: int,
+                         spans: List[Tuple[int, int, bool, bool]]):
+        """按相同字符切分区间，连续 3 个及以上的分隔符标记为不换行"""
+        pos = start
+        # groupby 在 C 层按相同字符切分连续片段
+        for char, group in groupby(text[start:end]):
+            run_end = pos + sum(1 for _ in group)
+            spans.append((pos, run_end, False,
+                          run_end - pos >= 3 and char in self.SEPARATOR_CHARS))
+            pos = run_end
     
-    def _split_separators(self, text: str) -> List[TextSegment]:
-        """拆分连续分隔符"""
-        if not text:
-            return []
-        
-        result = []
-        i = 0
-        while i < len(text):
-            char = text[i]
-            j = i + 1
-            while j < len(text) and text[j] == char:
-                j += 1
-            
-            if j - i >= 3 and char in self.SEPARATOR_CHARS:
-                result.append(TextSegment(text=text[i:j], no_wrap=True))
+    def render_emoji(self, emoji: str, size: int) -> Optional[Image.Image]:
+        """从 Twemoji CDN 获取 emoji 图片，支持磁盘缓存和失败 TTL
+
+        返回的图片与内存缓存共享像素数据且为只读，需要修改时请先 copy()。
+        """
+        found, img = self._lookup_caches(emoji, size)
+        if found:
+            return img
+        self._maybe_start_archive_prefetch()
+
+        owned, waiting = self._claim_inflight([emoji], size)
+        if waiting:
+            return waiting[emoji].result()
+        img = None
+        try:
+            img = self._download_sync(emoji, size)
+        finally:
+            self._resolve_inflight(owned, size, {emoji: img})
+        return img
+
+    def render_emojis(self, emojis: Iterable[str], size: int) -> Dict[str, Optional[Image.Image]]:
+        """批量获取 emoji 图片
+
+        先依次查询各级缓存；未命中的 emoji 多于一个时提交到下载线程池，
+        经共享的 requests 会话并发下载，调用方阻塞等待全部结果。
+        下载成功后由工作线程同步写入磁盘缓存。
+
+        Args:
+            emojis: emoji 序列（允许重复）
+            size: 目标尺寸
+
+        Returns:
+            emoji -> 图片（获取失败为 None）
+        """
+        result: Dict[str, Optional[Image.Image]] = {}
+        missing: List[str] = []
+        for emoji in dict.fromkeys(emojis):
+            found, img = self._lookup_caches(emoji, size)
+            if found:
+                result[emoji] = img
             else:
-                result.append(TextSegment(text=text[i:j]))
-            i = j
+                missing.append(emoji)
+
+        if not missing:
+            return result
+
+        self._maybe_start_archive_prefetch()
+
+        # 其他线程正在下载的 emoji 不重复请求，等待其结果
+        owned, waiting = self._claim_inflight(missing, size)
+
+        try:
+            futures: Dict[str, Future] = {}
+            if len(owned) > 1:
+                try:
+                    for emoji in owned:
+                        futures[emoji] = self._download_pool.submit(self._download_sync, emoji, size)
+                except RuntimeError:
+                    # 处理器已关闭、线程池不再接收任务时，其余 emoji 在当前线程逐个下载
+                    pass
+            for emoji in owned:
+                future = futures.get(emoji)
+                result[emoji] = future.result() if future is not None else self._download_sync(emoji, size)
+        finally:
+            self._resolve_inflight(owned, size, result)
+
+        for emoji, future in waiting.items():
+            result[emoji] = future.result()
         return result
-    
-    def render_emoji(self, emoji: str, size: int) -> Optional[Image.Image]:
-        """从 Twemoji CDN 获取 emoji 图片，支持磁盘缓存和失败 TTL"""
+
+    def _claim_inflight(self, emojis: List[str], size: int) -> Tuple[List[str], Dict[str, Future]]:
+        """登记待下载的 emoji
+
+        Returns:
+            (由当前调用负责下载的 emoji, 已由其他调用下载中的 emoji -> Future)
+        """
+        owned: List[str] = []
+        waiting: Dict[str, Future] = {}
+        with self._inflight_lock:
+            for emoji in emojis:
+                key = f"{emoji}_{size}"
+                future = self._inflight.get(key)
+                if future is None:
+                    self._inflight[key] = Future()
+                    owned.append(emoji)
+                else:
+                    waiting[emoji] = future
+        return owned, waiting
+
+    def _resolve_inflight(self, emojis: List[str], size: int,
+                          result: Dict[str, Optional[Image.Image]]):
+        """下载结束后通知等待方并移除登记，未取得结果的 emoji 视为失败"""
+        with self._inflight_lock:
+            futures = [self._inflight.pop(f"{emoji}_{size}", None) for emoji in emojis]
+        for emoji, future in zip(emojis, futures):
+            if future is not None:
+                future.set_result(result.get(emoji))
+
+    def _lookup_caches(self, emoji: str, size: int) -> Tuple[bool, Optional[Image.Image]]:
+        """依次查询内存缓存、磁盘缓存、Twemoji 发布包与失败缓存
+
+        Returns:
+            (是否命中, 图片)；命中失败缓存时图片为 None
+        """
         from astrbot.api import logger
-        import time
-        
+
         cache_key = f"{emoji}_{size}"
 
         now = time.time()
@@ -132,125 +384,251 @@ class EmojiHandler:
             self._cleanup_failed_cache(now)
 
         # 1. 检查内存缓存
-        if cache_key in self._cache:
+        cached = self._get_cached(cache_key)
+        if cached is not None:
             logger.debug(f"[Emoji] 内存缓存命中: {cache_key}")
-            cached = self._cache[cache_key]
-            self._cache.move_to_end(cache_key)
-            return cached.copy()
-        
-        # 2. 检查失败缓存（带 TTL）
-        if emoji in self._failed:
-            failed_time = self._failed[emoji]
-            if time.time() - failed_time < self._failed_ttl:
-                # 仍在 TTL 内，跳过请求
-                logger.debug(f"[Emoji] 失败缓存命中: {repr(emoji)} (TTL 未过期)")
-                return None
-            else:
-                # TTL 已过期，移除失败记录
-                logger.debug(f"[Emoji] 失败缓存过期，重新尝试: {repr(emoji)}")
-                del self._failed[emoji]
-        
-        # 3. 计算磁盘缓存文件名
-        # 使用 emoji codepoint + size 作为文件名，确保唯一性
-        codepoints = '_'.join(f'{ord(c):04X}' for c in emoji)
-        cache_filename = f"{codepoints}_{size}.png"
-        cache_file_path = self._cache_dir / cache_filename
-        
-        # 4. 检查磁盘缓存
-        if cache_file_path.exists():
+            return True, cached
+
+        # 2. 检查磁盘缓存（优先原图，其次旧版按尺寸保存的文件）
+        for cache_file_path in (self._get_cache_file_path(emoji),
+                                self._get_cache_file_path(emoji, size)):
+            if not cache_file_path.exists():
+                continue
             try:
                 with open(cache_file_path, 'rb') as f:
                     img = Image.open(f).convert("RGBA")
                     # 调整到目标大小
-                    img = img.resize((size, size), Image.LANCZOS)
-                    # 写入内存缓存
-                    self._remember_cache(cache_key, img)
+                    img = self._resize(img, size)
                     logger.debug(f"[Emoji] 磁盘缓存命中: {cache_file_path}")
-                    return img.copy()
+                    # 写入内存缓存
+                    return True, self._remember_cache(cache_key, img)
             except Exception as e:
                 logger.warning(f"[Emoji] 磁盘缓存读取失败: {cache_file_path} - {e}")
-        
-        # 5. 下载 emoji
-        urls = self._get_twemoji_urls(emoji)
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        
+
+        # 3. 检查已解压的 Twemoji 发布包
+        if self._archive_ready:
+            for cp in self._get_twemoji_codepoints(emoji):
+                archive_path = self._archive_dir / f"{cp}.png"
+                if not archive_path.exists():
+                    continue
+                try:
+                    img = self._store_downloaded(emoji, size, archive_path.read_bytes(), persist=False)
+                    logger.debug(f"[Emoji] 发布包命中: {archive_path}")
+                    return True, img
+                except Exception as e:
+                    logger.warning(f"[Emoji] 发布包图片读取失败: {archive_path} - {e}")
+
+        # 4. 检查失败缓存（带 TTL），本地均未命中时才决定是否跳过下载
+        with self._failed_lock:
+            failed_time = self._failed.get(emoji)
+            expired = failed_time is not None and now - failed_time >= self._failed_ttl
+            if expired:
+                # TTL 已过期，移除失败记录
+                self._failed.pop(emoji, None)
+        if failed_time is not None:
+            if not expired:
+                # 仍在 TTL 内，跳过请求
+                logger.debug(f"[Emoji] 失败缓存命中: {repr(emoji)} (TTL 未过期)")
+                return True, None
+            logger.debug(f"[Emoji] 失败缓存过期，重新尝试: {repr(emoji)}")
+
+        return False, None
+
+    def _maybe_start_archive_prefetch(self):
+        """首次缓存未命中时启动后台线程下载 Twemoji 发布包（每个进程最多一次）"""
+        if not self._archive_prefetch or self._archive_ready:
+            return
+        with self._archive_lock:
+            if self._archive_started or self._closed:
+                return
+            self._archive_started = True
+            self._archive_running = True
+        threading.Thread(target=self._prefetch_archive, name="twemoji-archive", daemon=True).start()
+
+    def _prefetch_archive(self):
+        """下载固定版本的 Twemoji 发布包，将 72x72 PNG 解压到缓存目录"""
+        from astrbot.api import logger
+
+        logger.info(f"[Emoji] 开始预取 Twemoji 发布包: {self.ARCHIVE_URL}")
+        try:
+            self._archive_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryFile() as tmp:
+                with self._session.get(self.ARCHIVE_URL, stream=True,
+                                       timeout=max(self._timeout, 60)) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        tmp.write(chunk)
+                tmp.seek(0)
+
+                count = 0
+                with tarfile.open(fileobj=tmp, mode="r:gz") as archive:
+                    for member in archive:
+                        if not member.isfile() or not member.name.endswith(".png"):
+                            continue
+                        if f"/assets/{self.ARCHIVE_DIR}/" not in member.name:
+                            continue
+                        data = archive.extractfile(member)
+                        if data is None:
+                            continue
+                        # 仅取文件名，避免归档内路径穿越
+                        (self._archive_dir / Path(member.name).name).write_bytes(data.read())
+                        count += 1
+
+            self._archive_marker.touch()
+            self._archive_ready = True
+            logger.info(f"[Emoji] Twemoji 发布包预取完成，共 {count} 个图片")
+        except Exception as e:
+            logger.warning(f"[Emoji] Twemoji 发布包预取失败: {e}")
+        finally:
+            with self._archive_lock:
+                self._archive_running = False
+                close_session = self._closed
+            # 预取期间处理器已关闭时，由本线程在用完后关闭 HTTP 会话
+            if close_session:
+                self._session.close()
+
+    def _get_cache_file_path(self, emoji: str, size: Optional[int] = None) -> Path:
+        """计算磁盘缓存文件路径
+
+        默认返回原图路径 `{codepoints}.png`；指定 size 时返回旧版按尺寸保存的路径。
+        """
+        # 使用 emoji codepoint 作为文件名，确保唯一性
+        codepoints = '_'.join(f'{ord(c):04X}' for c in emoji)
+        if size is None:
+            return self._cache_dir / f"{codepoints}.png"
+        return self._cache_dir / f"{codepoints}_{size}.png"
+
+    def _download_sync(self, emoji: str, size: int) -> Optional[Image.Image]:
+        """逐个 CDN 同步下载 emoji"""
+        from astrbot.api import logger
+
         last_error = None
-        for url in urls:
+        for url in self._get_twemoji_urls(emoji):
             try:
-                req = Request(url, headers=headers)
                 # 使用配置化的超时时间
-                with urlopen(req, timeout=self._timeout) as response:
-                    img_data = response.read()
-                    img = Image.open(BytesIO(img_data)).convert("RGBA")
-                    img = img.resize((size, size), Image.LANCZOS)
-                    
-                    # 写入内存缓存
-                    self._remember_cache(cache_key, img)
-
-                    # 写入磁盘缓存
-                    try:
-                        img.save(cache_file_path, "PNG")
-                        logger.debug(f"[Emoji] 磁盘缓存写入成功: {cache_file_path}")
-                    except Exception as e:
-                        logger.warning(f"[Emoji] 磁盘缓存写入失败: {cache_file_path} - {e}")
-
-                    return img.copy()
+                response = self._session.get(url, timeout=self._timeout)
+                response.raise_for_status()
+                return self._store_downloaded(emoji, size, response.content)
             except Exception as e:
                 last_error = e
                 logger.debug(f"[Emoji] CDN 下载失败: {url} - {e}")
                 continue
-        
-        # 6. 所有 URL 都失败，记录失败时间戳
-        codepoints_str = ' '.join(f'U+{ord(c):04X}' for c in emoji)
-        logger.warning(f"[Emoji] 获取失败: {repr(emoji)} ({codepoints_str}) - {last_error}")
-        self._failed[emoji] = now
+
+        self._mark_failed(emoji, last_error)
         return None
 
-    def _remember_cache(self, key: str, image: Image.Image):
-        """记录内存缓存并控制上限。"""
-        self._cache[key] = image
-        self._cache.move_to_end(key)
-        while len(self._cache) > self._cache_max_items:
-            self._cache.popitem(last=False)
+    def _store_downloaded(self, emoji: str, size: int, img_data: bytes,
+                          persist: bool = True) -> Image.Image:
+        """解码下载结果并写入内存缓存，persist 为 True 时同时写入磁盘缓存"""
+        img = Image.open(BytesIO(img_data)).convert("RGBA")
+        img = self._resize(img, size)
+
+        # 写入内存缓存
+        img = self._remember_cache(f"{emoji}_{size}", img)
+
+        if not persist:
+            return img
+
+        self._write_disk_cache(emoji, img_data)
+        return img
+
+    def _write_disk_cache(self, emoji: str, img_data: bytes):
+        """写入磁盘缓存：直接保存 CDN 原图，各尺寸按需缩放"""
+        from astrbot.api import logger
+
+        cache_file_path = self._get_cache_file_path(emoji)
+        try:
+            cache_file_path.write_bytes(img_data)
+            logger.debug(f"[Emoji] 磁盘缓存写入成功: {cache_file_path}")
+        except Exception as e:
+            logger.warning(f"[Emoji] 磁盘缓存写入失败: {cache_file_path} - {e}")
+
+    def _resize(self, img: Image.Image, size: int) -> Image.Image:
+        """缩放到目标尺寸；小尺寸下 BILINEAR 与 LANCZOS 观感无差别且更快"""
+        # 旧版按尺寸保存的缓存或原图恰好等于目标尺寸时无需缩放
+        if img.size == (size, size):
+            return img
+        resample = Image.LANCZOS if size > self.LANCZOS_MIN_SIZE else Image.BILINEAR
+        return img.resize((size, size), resample)
+
+    def _mark_failed(self, emoji: str, error: Optional[Exception]):
+        """所有 URL 都失败，记录失败时间戳"""
+        from astrbot.api import logger
+
+        codepoints_str = ' '.join(f'U+{ord(c):04X}' for c in emoji)
+        logger.warning(f"[Emoji] 获取失败: {repr(emoji)} ({codepoints_str}) - {error}")
+        with self._failed_lock:
+            self._failed[emoji] = time.time()
+            self._failed_dirty += 1
+            need_flush = self._failed_dirty >= self.FAILED_FLUSH_EVERY
+        if need_flush:
+            self._flush_failed_cache()
+
+    def _remember_cache(self, key: str, image: Image.Image) -> Image.Image:
+        """记录内存缓存并控制上限，返回引用缓存数据的只读图片。"""
+        data = image.tobytes()
+        with self._cache_lock:
+            self._cache[key] = (data, image.size)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_max_items:
+                self._cache.popitem(last=False)
+        return self._cached_image(data, image.size)
+
+    def _get_cached(self, key: str) -> Optional[Image.Image]:
+        """查询内存缓存，命中时标记为最近使用；查询与更新在同一把锁内完成"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            self._cache.move_to_end(key)
+        return self._cached_image(*entry)
+
+    @staticmethod
+    def _cached_image(data: bytes, size: Tuple[int, int]) -> Image.Image:
+        """将缓存字节零拷贝包装为只读 RGBA 图片"""
+        return Image.frombuffer("RGBA", size, data, "raw", "RGBA", 0, 1)
 
     def _cleanup_failed_cache(self, now: float):
         """清理失败缓存中过期项。"""
-        expired = [k for k, ts in self._failed.items() if now - ts >= self._failed_ttl]
-        for key in expired:
-            self._failed.pop(key, None)
-        self._last_failed_cleanup = now
+        with self._failed_lock:
+            expired = [k for k, ts in self._failed.items() if now - ts >= self._failed_ttl]
+            for key in expired:
+                self._failed.pop(key, None)
+            self._last_failed_cleanup = now
     
-    def _get_twemoji_urls(self, emoji: str) -> list:
+    def _get_twemoji_codepoints(self, emoji: str) -> Tuple[str, ...]:
+        """生成所有可能的 Twemoji 文件名（codepoint 格式），按匹配优先级排序"""
+        return _twemoji_codepoints(emoji)
+
+    def _get_twemoji_urls(self, emoji: str) -> Tuple[str, ...]:
         """生成所有可能的 Twemoji URL 格式"""
-        urls = []
-        
-        # 清理 emoji（移除变体选择符但保留零宽连接符用于组合emoji）
-        cleaned_no_fe0f = emoji.replace('\ufe0f', '')
-        cleaned_all = emoji.replace('\ufe0f', '').replace('\u200d', '')
-        
-        # 不同的 codepoint 格式
-        formats = set()
-        
-        # 格式1: 移除 fe0f 的完整序列（保留 200d）
-        formats.add('-'.join(f'{ord(c):x}' for c in cleaned_no_fe0f))
-        
-        # 格式2: 完全清理后的序列
-        formats.add('-'.join(f'{ord(c):x}' for c in cleaned_all))
-        
-        # 格式3: 只取第一个字符
-        if cleaned_all:
-            formats.add(f'{ord(cleaned_all[0]):x}')
-        
-        # 格式4: 原始带 fe0f
-        formats.add('-'.join(f'{ord(c):x}' for c in emoji))
-        
-        # 格式5: 单字符带 fe0f
-        if cleaned_all:
-            formats.add(f'{ord(cleaned_all[0]):x}-fe0f')
-        
-        # 组合所有 CDN 和格式
-        for cp in formats:
-            for base in self.CDN_BASES:
-                urls.append(f"{base}/{cp}.png")
-        
-        return urls
+        return _twemoji_urls(emoji, tuple(self.CDN_BASES))
+
+
+@lru_cache(maxsize=1024)
+def _twemoji_codepoints(emoji: str) -> Tuple[str, ...]:
+    """计算 emoji 的候选 codepoint 文件名（结果缓存，下载重试时直接复用）"""
+    # 清理 emoji（移除变体选择符但保留零宽连接符用于组合emoji）
+    cleaned_no_fe0f = emoji.replace('\ufe0f', '')
+    cleaned_all = cleaned_no_fe0f.replace('\u200d', '')
+
+    # 不同的 codepoint 格式（按优先级，完整序列优先于单字符）：
+    # 1. 移除 fe0f 的完整序列（保留 200d） 2. 完全清理后的序列 3. 原始带 fe0f
+    formats = (
+        '-'.join(f'{ord(c):x}' for c in cleaned_no_fe0f),
+        '-'.join(f'{ord(c):x}' for c in cleaned_all),
+        '-'.join(f'{ord(c):x}' for c in emoji),
+    )
+    if cleaned_all:
+        # 4. 只取第一个字符 5. 单字符带 fe0f
+        first = f'{ord(cleaned_all[0]):x}'
+        formats += (first, f'{first}-fe0f')
+
+    # 去重并保持优先级顺序
+    return tuple(dict.fromkeys(formats))
+
+
+@lru_cache(maxsize=1024)
+def _twemoji_urls(emoji: str, bases: Tuple[str, ...]) -> Tuple[str, ...]:
+    """组合所有 CDN 和 codepoint 格式"""
+    return tuple(f"{base}/{cp}.png" for cp in _twemoji_codepoints(emoji) for base in bases)
@@ -2,20 +2,38 @@
 
 import re
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Optional
 from .styles import TextSegment, TableRow, TableCell
 
-# 行内样式正则模式（从长到短排序）
+# 行内样式正则模式（从长到短排序），每个模式用唯一命名分组捕获内部文本
 INLINE_PATTERNS = [
-    (r'\*\*(.+?)\*\*', 'bold'),      # **粗体**
-    (r'__(.+?)__', 'bold'),          # __粗体__
-    (r'~~(.+?)~~', 'strike'),        # ~~删除线~~
-    (r'``(.+?)``', 'code'),          # ``代码``
-    (r'\*(.+?)\*', 'italic'),        # *斜体*
-    (r'_(.+?)_', 'italic'),          # _斜体_
-    (r'`(.+?)`', 'code'),            # `代码`
+    (r'\*\*(?P<bold_star>.+?)\*\*', 'bold'),      # **粗体**
+    (r'__(?P<bold_under>.+?)__', 'bold'),          # __粗体__
+    (r'~~(?P<strike>.+?)~~', 'strike'),            # ~~删除线~~
+    (r'``(?P<code_double>.+?)``', 'code'),         # ``代码``
+    (r'\*(?P<italic_star>.+?)\*', 'italic'),       # *斜体*
+    (r'_(?P<italic_under>.+?)_', 'italic'),        # _斜体_
+    (r'`(?P<code>.+?)`', 'code'),                  # `代码`
 ]
 
+# 合并为单个交替正则：同一位置按列表顺序优先匹配，等价于逐个模式取最早匹配
+_INLINE_RE = re.compile('|'.join(pattern for pattern, _ in INLINE_PATTERNS))
+# 分组名 -> 样式类型（每个模式只有一个分组，分组序号与列表下标一一对应）
+_INLINE_STYLES = {name: INLINE_PATTERNS[idx - 1][1] for name, idx in _INLINE_RE.groupindex.items()}
+
+# 行级结构正则（模块加载时预编译）
+_RE_CODE_BLOCK = re.compile(r'^```(\w*)\s*$')          # ```lang
+_RE_HR = re.compile(r'^[\s\-*_]{3,}\s*$')               # --- *** ___
+_RE_TABLE_ROW = re.compile(r'^\|(.+)\|\s*$')            # | a | b |
+_RE_TABLE_SEP = re.compile(r'^[\s\-:]+$')                # |---|:---:|
+_RE_TABLE_RULE = re.compile(r'^[\s|\-:]+$')              # 整行分隔线
+_RE_HEADING = re.compile(r'^(#{1,6})\s+(.+)$')          # # 标题
+_RE_ULIST = re.compile(r'^(\s*)([*+-])\s+(.+)$')        # - 无序列表
+_RE_OLIST = re.compile(r'^(\s*)(\d+)\.\s+(.+)$')        # 1. 有序列表
+# 强调标记之后的有效内容（非空白、非 * 与 `）
+_RE_CONTENT_CHAR = re.compile(r'[^\s*`]')
+
 
 @dataclass
 class LineContext:
@@ -61,7 +79,7 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
             return []
 
     # 检查代码块开始
-    code_block_match = re.match(r'^```(\w*)\s*$', text)
+    code_block_match = _RE_CODE_BLOCK.match(text)
     if code_block_match:
         ctx.in_code_block = True
         ctx.code_block_lang = code_block_match.group(1)
@@ -72,7 +90,7 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
         return []
 
     # 检查分割线 (--- 或 *** 或 ___)
-    if re.match(r'^[\s\-*_]{3,}\s*$', text.strip()):
+    if _RE_HR.match(text.strip()):
         # 如果在表格中，结束表格并返回列表形式
         if ctx.in_table:
             table_segments = _serialize_table(ctx)
@@ -88,13 +106,13 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
         return [TextSegment(text="", horizontal_rule=True)]
 
     # 检查表格
-    table_match = re.match(r'^\|(.+)\|\s*$', text)
+    table_match = _RE_TABLE_ROW.match(text)
     if table_match:
         row_text = table_match.group(1).strip()
         cells = [c.strip() for c in row_text.split('|')]
 
         # 检查是否是分隔行 (|---|---|)
-        if re.match(r'^[\s\-:]+$', cells[0] if cells else ''):
+        if _RE_TABLE_SEP.match(cells[0] if cells else ''):
             ctx.table_header_parsed = True
             return []
 
@@ -123,7 +141,7 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
         return table_segments
 
     # 检查标题 (# ## ### 等)
-    heading_match = re.match(r'^(#{1,6})\s+(.+)$', text)
+    heading_match = _RE_HEADING.match(text)
     if heading_match:
         level = len(heading_match.group(1))
         content = heading_match.group(2)
@@ -141,7 +159,7 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
         return segments
 
     # 检查无序列表 (* + -)
-    unordered_match = re.match(r'^(\s*)([*+-])\s+(.+)$', text)
+    unordered_match = _RE_ULIST.match(text)
     if unordered_match:
         indent = unordered_match.group(1)
         content = unordered_match.group(3)
@@ -154,7 +172,7 @@ def parse_markdown(text: str, ctx: LineContext = None) -> list[TextSegment]:
         return segments
 
     # 检查有序列表 (1. 2. 3.)
-    ordered_match = re.match(r'^(\s*)(\d+)\.\s+(.+)$', text)
+    ordered_match = _RE_OLIST.match(text)
     if ordered_match:
         indent = ordered_match.group(1)
         index = int(ordered_match.group(2))
@@ -178,7 +196,7 @@ def _parse_line(text: str, ctx: LineContext) -> list[TextSegment]:
         return []
 
     # 检查标题
-    heading_match = re.match(r'^(#{1,6})\s+(.+)$', text)
+    heading_match = _RE_HEADING.match(text)
     if heading_match:
         level = len(heading_match.group(1))
         content = heading_match.group(2)
@@ -225,35 +243,35 @@ def _serialize_table(ctx: LineContext) -> list[TextSegment]:
 
     hide_first_col_label = bool(ctx.hide_table_first_column_label)
 
+    # 各列标签文本只格式化一次
+    label_texts = [f"{field_name}：" for field_name in headers]
+    label_texts += [f"字段{col_idx + 1}：" for col_idx in range(len(headers), max_cols)]
+
     # 为每个单元格生成列表项
     result_segments = []
     for row in data_rows:
         for col_idx, cell in enumerate(row.cells):
-            # 获取字段名
-            field_name = headers[col_idx] if col_idx < len(headers) else f"字段{col_idx + 1}"
-
-            # 获取单元格内容片段并继承列表属性
-            cell_content = []
-            for seg in cell.segments:
+            # 获取单元格内容片段并继承列表属性，同时判断是否有内容
+            cell_content = cell.segments
+            has_text = False
+            for seg in cell_content:
                 seg.list_item = True
                 seg.list_ordered = False
                 seg.list_level = 0
-                cell_content.append(seg)
+                has_text = has_text or bool(seg.text)
 
             # 开关：隐藏第一列字段名标签（仅隐藏标签，不隐藏内容）
             if hide_first_col_label and col_idx == 0:
-                if cell_content and any(seg.text for seg in cell_content):
+                if has_text:
                     result_segments.extend(cell_content)
                 continue
 
             # 创建标签片段（字段名）
-            label_seg = TextSegment(text=f"{field_name}：")
-            label_seg.list_item = True
-            label_seg.list_ordered = False
-            label_seg.list_level = 0
+            label_seg = TextSegment(text=label_texts[col_idx], list_item=True,
+                                    list_ordered=False, list_level=0)
 
             # 如果单元格有内容，合并标签和内容
-            if cell_content and any(seg.text for seg in cell_content):
+            if has_text:
                 result_segments.append(label_seg)
                 result_segments.extend(cell_content)
             else:
@@ -268,21 +286,41 @@ def _parse_inline_styles_with_autoclose(text: str, ctx: LineContext) -> list[Tex
     if not text:
         return []
 
-    normalized = _normalize_escaped_asterisk_for_autoclose(text)
-    segments, next_bold, next_italic, next_pending_bold_close = _parse_line_with_emphasis_state(
-        normalized,
+    records, next_bold, next_italic, next_pending_bold_close = _parse_autoclose_cached(
+        text,
         ctx.em_open_bold,
         ctx.em_open_italic,
         ctx.em_pending_bold_close,
     )
 
-    for seg in segments:
-        seg.text = seg.text.replace("＊", "*")
-
     ctx.em_open_bold = next_bold
     ctx.em_open_italic = next_italic
     ctx.em_pending_bold_close = next_pending_bold_close
-    return _merge_segments(segments)
+    # 调用方会写入标题、引用、列表等行级属性，因此每次都基于缓存结果新建 TextSegment
+    return [TextSegment(text=seg_text, bold=bold, italic=italic, code=code, strike=strike)
+            for seg_text, bold, italic, code, strike in records]
+
+
+@lru_cache(maxsize=2048)
+def _parse_autoclose_cached(text: str,
+                            bold_open: bool,
+                            italic_open: bool,
+                            pending_bold_close: bool) -> tuple[tuple[tuple[str, bool, bool, bool, bool], ...], bool, bool, bool]:
+    """按 (行文本, 跨行强调状态) 缓存自动闭合解析结果，返回不可变片段描述与下一行的强调状态"""
+    normalized = _normalize_escaped_asterisk_for_autoclose(text)
+    segments, next_bold, next_italic, next_pending_bold_close = _parse_line_with_emphasis_state(
+        normalized,
+        bold_open,
+        italic_open,
+        pending_bold_close,
+    )
+
+    for seg in segments:
+        seg.text = seg.text.replace("＊", "*")
+
+    records = tuple((seg.text, seg.bold, seg.italic, seg.code, seg.strike)
+                    for seg in _merge_segments(segments))
+    return records, next_bold, next_italic, next_pending_bold_close
 
 
 def _parse_inline_styles(text: str) -> list[TextSegment]:
@@ -290,8 +328,16 @@ def _parse_inline_styles(text: str) -> list[TextSegment]:
     if not text:
         return []
 
-    segments = _parse_recursive(text)
-    return _merge_segments(segments)
+    # 调用方会修改返回片段的行级属性，因此每次都基于缓存结果新建 TextSegment
+    return [TextSegment(text=seg_text, bold=bold, italic=italic, code=code, strike=strike)
+            for seg_text, bold, italic, code, strike in _parse_inline_styles_cached(text)]
+
+
+@lru_cache(maxsize=4096)
+def _parse_inline_styles_cached(text: str) -> tuple[tuple[str, bool, bool, bool, bool], ...]:
+    """解析行内样式并缓存不可变的片段描述 (text, bold, italic, code, strike)"""
+    segments = _merge_segments(_parse_recursive(text))
+    return tuple((seg.text, seg.bold, seg.italic, seg.code, seg.strike) for seg in segments)
 
 
 def _normalize_escaped_asterisk_for_autoclose(text: str) -> str:
@@ -333,12 +379,7 @@ def _parse_line_with_emphasis_state(text: str,
         buffer.clear()
 
     def has_content_after(start: int) -> bool:
-        for idx in range(start, len(text)):
-            ch = text[idx]
-            if ch.isspace() or ch in ('*', '`'):
-                continue
-            return True
-        return False
+        return _RE_CONTENT_CHAR.search(text, start) is not None
 
     while i < len(text):
         if text[i] == '`':
@@ -394,44 +435,25 @@ def _parse_line_with_emphasis_state(text: str,
 
 
 def _parse_recursive(text: str) -> list[TextSegment]:
-    """递归解析嵌套样式"""
+    """解析嵌套样式：单次 finditer 线性扫描，仅对样式内部文本递归"""
     segments: list[TextSegment] = []
     pos = 0
 
-    while pos < len(text):
-        earliest_match = None
-        pattern_idx = -1
-        earliest_pos = len(text)
-
-        for idx, (pattern, _) in enumerate(INLINE_PATTERNS):
-            match = re.search(pattern, text[pos:])
-            if match:
-                match_start = pos + match.start()
-                if match_start < earliest_pos:
-                    earliest_pos = match_start
-                    earliest_match = (match.start(), match.end(), match)
-                    pattern_idx = idx
+    for match in _INLINE_RE.finditer(text):
+        start = match.start()
+        if start > pos:
+            segments.append(TextSegment(text=text[pos:start]))
 
-        if earliest_match:
-            start, end, match = earliest_match
-            style_type = INLINE_PATTERNS[pattern_idx][1]
+        style_type = _INLINE_STYLES[match.lastgroup]
+        inner_segments = _parse_recursive(match.group(match.lastgroup))
+        for seg in inner_segments:
+            _apply_style(seg, style_type)
+        segments.extend(inner_segments)
 
-            if start > 0:
-                segments.append(TextSegment(text=text[pos:pos + start]))
+        pos = match.end()
 
-            inner_text = match.group(1)
-            inner_segments = _parse_recursive(inner_text)
-
-            for seg in inner_segments:
-                _apply_style(seg, style_type)
-            segments.extend(inner_segments)
-
-            pos += end
-        else:
-            remaining = text[pos:]
-            if remaining:
-                segments.append(TextSegment(text=remaining))
-            break
+    if pos < len(text):
+        segments.append(TextSegment(text=text[pos:]))
 
     return segments
 
@@ -454,29 +476,19 @@ def _merge_segments(segments: list[TextSegment]) -> list[TextSegment]:
         return []
 
     merged = [segments[0]]
+    last_key = segments[0].style_key
 
     for seg in segments[1:]:
+        key = seg.style_key
         last = merged[-1]
 
-        if (last.text and seg.text and
-                not seg.is_emoji and not last.is_emoji and
-                not seg.no_wrap and not last.no_wrap and
-                last.heading == seg.heading and
-                last.quote == seg.quote and
-                last.code_block == seg.code_block and
-                last.horizontal_rule == seg.horizontal_rule and
-                last.bold == seg.bold and
-                last.italic == seg.italic and
-                last.code == seg.code and
-                last.strike == seg.strike and
-                last.list_item == seg.list_item and
-                last.list_ordered == seg.list_ordered and
-                last.list_level == seg.list_level and
-                last.list_index == seg.list_index and
-                last.list_continuation == seg.list_continuation):
+        # 样式元组已包含 is_emoji / no_wrap，相等时只需检查当前片段
+        if (key == last_key and last.text and seg.text and
+                not seg.is_emoji and not seg.no_wrap):
             last.text += seg.text
         else:
             merged.append(seg)
+            last_key = key
 
     return merged
 
@@ -491,7 +503,7 @@ def parse_table(text: str) -> Optional[List[TableRow]]:
     for i, line in enumerate(lines):
         # 移除 │ 符号
         line = line.replace('│', '').strip()
-        if not line or re.match(r'^[\s|\-:]+$', line):
+        if not line or _RE_TABLE_RULE.match(line):
             continue
 
         cells = [c.strip() for c in line.split('|')]
@@ -1,10 +1,17 @@
 """文本渲染器"""
 
 import tempfile
+import threading
+from bisect import bisect_right
 from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import accumulate, groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import PIL
 from PIL import Image, ImageColor, ImageDraw, ImageFont
 
 from .styles import TextSegment, TableRow
@@ -12,23 +19,171 @@ from .emoji import EmojiHandler
 from .markdown import parse_markdown, LineContext, parse_table
 
 # 不能出现在行首的标点符号（避头标点）
-NO_LINE_START = set('，。、；：？！）】》」』"\',.;:?!)>]}·…—～')
+NO_LINE_START = frozenset('，。、；：？！）】》」』"\',.;:?!)>]}·…—～')
+
+# 表格卡片排版结果：[(数据行, 换行后的行列表, 卡片高度)]
+TableLayout = List[Tuple[TableRow, List[List[Tuple[TextSegment, int]]], int]]
+
+
+@dataclass(slots=True)
+class LineRenderInfo:
+    """单个渲染行的布局结果，画布高度计算与绘制阶段共用"""
+    segments: List[Tuple[TextSegment, int]] = field(default_factory=list)
+    height: int = 0
+    is_empty: bool = False
+    is_table: bool = False
+    is_hr: bool = False
+    table_data: Optional[List[TableRow]] = None
+    layout: Optional[Dict[str, Any]] = None  # _build_line_layout 的结果
+    table_layout: Optional[TableLayout] = None  # _layout_table 的结果
+    is_code_line: bool = False
+    has_emoji: bool = False
+
+
+def _find_wrap_points(chars: Sequence[str], widths: List[int], current_x: int,
+                      line_open: bool, limit: int) -> Tuple[List[Tuple[int, bool]], int]:
+    """逐字符换行核心：只做整数运算与标点判断，不创建片段
+
+    Args:
+        chars: 字符序列（字符串或字符列表，仅按下标访问）
+        widths: 对应的字符宽度
+        current_x: 当前行已占用宽度
+        line_open: 当前行是否已有片段
+        limit: 可用宽度上限（已扣除安全余量）
+
+    Returns:
+        (换行点列表 [(在该下标字符前换行, 是否为末两字符的前瞻换行)], 处理完后的行宽)
+    """
+    breaks: List[Tuple[int, bool]] = []
+    # 整段放得下时（累计宽度不超过上限）逐字判断与末尾前瞻都不会触发换行，直接返回
+    total = current_x + sum(widths)
+    if total <= limit:
+        return breaks, total
+
+    # 前缀和 + 二分：每次直接定位当前行第一个越界字符，只在该处做换行判断
+    cum = list(accumulate(widths, initial=0))
+    count = len(chars)
+    last_pair = count - 2
+    # 倒数第二个字符处理时当前行是否已有内容（前瞻换行的前提）
+    pair_open = line_open or last_pair > 0
+    no_line_start = NO_LINE_START
+    # 下标 i 字符之前的行宽为 base + cum[i]，换行时重置 base
+    base = current_x
+    pos = 0
+    while pos < count:
+        idx = bisect_right(cum, limit - base, pos + 1) - 1
+        if idx >= count:
+            break
+
+        if idx == count - 1 and pos <= last_pair and pair_open:
+            # 末尾两个字符放不下时整体换到下一行，避免单字孤行
+            breaks.append((last_pair, True))
+            base = -cum[last_pair]
+            pos = count - 1
+            continue
+
+        if base + cum[idx] > 0 and chars[idx] not in no_line_start:
+            breaks.append((idx, False))
+            base = -cum[idx]
+        elif idx == last_pair and pair_open:
+            # 倒数第二个字符无法正常换行（避头标点或位于行首）时，末尾两字符同样整体换行
+            breaks.append((idx, True))
+            base = -cum[idx]
+        pos = idx + 1
+    return breaks, base + cum[count]
+
+
+def _table_line_runs(widths: Sequence[int], code_flags: Sequence[bool],
+                     start_x: int) -> List[Tuple[int, int, int, int]]:
+    """表格卡片单行的定位计算：连续的行内代码合并为一个绘制单元，其余片段各自成单元
+
+    只做整数运算，不访问片段对象与字体。
+
+    Returns:
+        [(起始下标, 结束下标, x 坐标, 宽度)]
+    """
+    runs: List[Tuple[int, int, int, int]] = []
+    x = start_x
+    idx = 0
+    # 按是否为代码分组：代码组整体成一个单元，非代码组逐片段成单元
+    for is_code, group in groupby(zip(code_flags, widths), key=itemgetter(0)):
+        if is_code:
+            group_widths = [w for _, w in group]
+            width = sum(group_widths)
+            end = idx + len(group_widths)
+            runs.append((idx, end, x, width))
+            x += width
+            idx = end
+        else:
+            for _, width in group:
+                runs.append((idx, idx + 1, x, width))
+                x += width
+                idx += 1
+    return runs
+
+
+@lru_cache(maxsize=64)
+def _italic_color(color: Tuple[int, ...]) -> Tuple[int, int, int]:
+    """斜体文字颜色：在原色基础上各通道加深 20（结果按颜色缓存）"""
+    return (max(color[0] - 20, 0),
+            max(color[1] - 20, 0),
+            max(color[2] - 20, 0))
+
+
+@lru_cache(maxsize=32)
+def _open_truetype(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """按 (路径, 字号) 缓存 FreeType 字体对象，配置变更重建渲染器时无需重新打开字体文件"""
+    return ImageFont.truetype(path, size=size)
+
+
+@lru_cache(maxsize=128)
+def _hex_to_rgb(color_value: str, fallback: str = "#ffffff") -> Tuple[int, int, int]:
+    """颜色字符串转 RGB，兼容十六进制与命名色（配置颜色种类很少，结果按参数缓存）"""
+    try:
+        return ImageColor.getrgb(color_value.strip())
+    except Exception:
+        try:
+            return ImageColor.getrgb(fallback.strip())
+        except Exception:
+            return 255, 255, 255
 
 
 class TextRenderer:
     """文本渲染器"""
 
+    # 每个进程只提示一次 Pillow 构建信息
+    _pillow_checked = False
+
+    # 固定配色
+    _HR_COLOR = (200, 200, 200)
+    _BLOCK_BG = (245, 245, 245)          # 代码块、表格卡片背景
+    _QUOTE_BAR_COLOR = (100, 149, 237)   # 引用竖条、表格卡片色条
+    _CODE_BG = (235, 235, 235)
+    _CODE_COLOR = (60, 60, 60)
+    _STRIKE_COLOR = (160, 160, 160)
+    _QUOTE_COLOR = (80, 80, 80)
+
     def __init__(self, config: Dict[str, Any], font_dir: Path):
         from astrbot.api import logger
         import tempfile
         
         self.config = config
         self.font_dir = font_dir
+
+        if not TextRenderer._pillow_checked:
+            TextRenderer._pillow_checked = True
+            # Pillow-SIMD 与 Pillow API 完全一致，版本号带 .postN 后缀
+            if ".post" in PIL.__version__:
+                logger.info(f"[Text2Image] 检测到 Pillow-SIMD {PIL.__version__}，已启用 SIMD 加速")
+            else:
+                logger.info(f"[Text2Image] 当前为标准 Pillow {PIL.__version__}，"
+                            f"可安装 pillow-simd 加速画布填充与 emoji 合成")
         
         # 从配置中读取 Emoji 相关参数
         emoji_timeout = int(self._get_config("emoji_timeout", 10))
         emoji_failed_ttl = int(self._get_config("emoji_failed_ttl", 3600))
         emoji_cache_dir = self._get_config("emoji_cache_dir", None)
+        emoji_archive_prefetch = bool(self._get_config("emoji_archive_prefetch", False))
         
         # 转换缓存目录路径（如果提供）
         cache_dir = Path(emoji_cache_dir) if emoji_cache_dir else font_dir.parent / ".emoji-cache"
@@ -37,12 +192,29 @@ class TextRenderer:
             font_dir=font_dir,  # 保留兼容性，实际未使用
             cache_dir=cache_dir,
             timeout=emoji_timeout,
-            failed_ttl=emoji_failed_ttl
+            failed_ttl=emoji_failed_ttl,
+            archive_prefetch=emoji_archive_prefetch,
         )
         self._font_cache: Dict[str, ImageFont.FreeTypeFont] = {}
         self._mono_font_cache: Dict[str, ImageFont.FreeTypeFont] = {}
-        self._char_width_cache: OrderedDict[Tuple[int, str, bool], int] = OrderedDict()
+        self._font_height_cache: Dict[int, int] = {}
+        # 字符宽度缓存：(id(font), char, is_bold) 为渲染宽度，(id(font), text, "adv") 为字符或短文本的 advance 宽度
+        self._char_width_cache: OrderedDict[Tuple[int, str, Any], int] = OrderedDict()
         self._char_width_cache_limit = max(1024, int(self._get_config("char_width_cache_limit", 8192)))
+        # 无引用、无列表行的布局只取决于 (text_area_width, scale)，按此缓存（结果只读共享）
+        self._plain_layout_cache: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        # 表格单元格换行结果：(id(font), id(mono_font), 宽度, 片段样式元组) -> 换行结果（只读共享）
+        self._card_wrap_cache: OrderedDict[Tuple[Any, ...], List[List[Tuple[TextSegment, int]]]] = OrderedDict()
+        # 圆角背景（表格卡片、代码块、行内代码）的 1 位遮罩：(宽, 高, 圆角) -> Image
+        self._rounded_mask_cache: Dict[Tuple[int, int, int], Image.Image] = {}
+        # 表格卡片（圆角底色 + 左侧竖条）的预合成印章：(宽, 高, 圆角, 竖条宽) -> (RGB 图, 1 位遮罩)
+        self._card_stamp_cache: Dict[Tuple[int, int, int, int], Tuple[Image.Image, Image.Image]] = {}
+        # 上述三个带淘汰的缓存会被并发的渲染线程读写，查询/更新/淘汰在锁内完成（计算在锁外）
+        self._shape_cache_lock = threading.Lock()
+
+    def close(self):
+        """释放渲染器持有的网络资源"""
+        self.emoji_handler.close()
 
     def _get_config(self, key: str, default: Any) -> Any:
         return self.config.get(key, default)
@@ -68,14 +240,16 @@ class TextRenderer:
             font_path = self.font_dir / font_name
             if font_path.exists():
                 try:
-                    font = ImageFont.truetype(str(font_path), size=size)
+                    font = _open_truetype(str(font_path), size)
                     self._font_cache[cache_key] = font
                     return font
                 except Exception:
                     continue
         
-        # 所有尝试都失败，回退到系统默认字体
-        return ImageFont.load_default()
+        # 所有尝试都失败，回退到系统默认字体（同样缓存，保证按 id(font) 缓存的宽度与度量不会错配）
+        font = ImageFont.load_default()
+        self._font_cache[cache_key] = font
+        return font
 
     def _load_mono_font(self, size: int) -> Optional[ImageFont.FreeTypeFont]:
         """加载等宽字体
@@ -92,7 +266,7 @@ class TextRenderer:
             font_path = self.font_dir / configured_font
             if font_path.exists():
                 try:
-                    font = ImageFont.truetype(str(font_path), size=size)
+                    font = _open_truetype(str(font_path), size)
                     self._mono_font_cache[cache_key] = font
                     return font
                 except Exception:
@@ -120,7 +294,7 @@ class TextRenderer:
                 font_path = font_dir / font_name
                 if font_path.exists():
                     try:
-                        font = ImageFont.truetype(str(font_path), size=size)
+                        font = _open_truetype(str(font_path), size)
                         self._mono_font_cache[cache_key] = font
                         return font
                     except Exception:
@@ -129,16 +303,6 @@ class TextRenderer:
         self._mono_font_cache[cache_key] = None
         return None
 
-    def _hex_to_rgb(self, color_value: str, fallback: str = "#ffffff") -> Tuple[int, int, int]:
-        """颜色字符串转 RGB，兼容十六进制与命名色。"""
-        try:
-            return ImageColor.getrgb(str(color_value).strip())
-        except Exception:
-            try:
-                return ImageColor.getrgb(str(fallback).strip())
-            except Exception:
-                return 255, 255, 255
-
     def render(self, text: str) -> Optional[str]:
         """渲染文本为图片"""
         # 兼容 LLM 输出的字面量 \n（仅在无真实换行时处理）
@@ -170,11 +334,23 @@ class TextRenderer:
         font_height = self._get_font_height(font, real_font_size)
         line_pixel_height = int(real_font_size * line_height)
 
+        # 标题与等宽字体在单次渲染内不变，提前算好供布局、行高与绘制阶段直接查表
+        # 布局测宽与绘制使用同一字体对象，绘制阶段可直接复用字符宽度缓存
+        # 按标题级别（1-6）下标取值，下标 0 为正文
+        heading_sizes = [real_font_size] + [int(real_font_size * (1.8 - lvl * 0.15)) for lvl in range(1, 7)]
+        heading_fonts = [font] + [self._load_font(size, bold=True) for size in heading_sizes[1:]]
+        heading_heights = [font_height] + [self._get_font_height(heading_font, size)
+                                           for heading_font, size in zip(heading_fonts[1:], heading_sizes[1:])]
+        mono_font = self._load_mono_font(real_font_size)
+        mono_font_height = self._get_font_height(mono_font, real_font_size) if mono_font else font_height
+
         # 解析所有行
         lines = text.split('\n')
         hide_first_col_label = bool(self._get_config("hide_table_first_column_label", False))
         ctx = LineContext(hide_table_first_column_label=hide_first_col_label)
         render_items = []  # (segments, is_empty, is_table, is_hr, table_data)
+        # 本次渲染内的字符宽度表：(id(font), is_bold) -> {char: width}
+        width_tables: Dict[Tuple[int, bool], Dict[str, int]] = {}
 
         for line in lines:
             md_segments = parse_markdown(line, ctx)
@@ -209,39 +385,19 @@ class TextRenderer:
 
                 if seg.code_block:
                     # 对代码块每行进行 emoji 分割（markdown.py 已按行拆分；这里只做 emoji 拆分，不再 split('\n')）
-                    emoji_subs = self.emoji_handler.split_text(seg.text)
-                    for es in emoji_subs:
-                        # 保留 code_block 属性
-                        es.code_block = True
-                        es.no_wrap = True
-                        # 如果是 emoji，不设置 code_block（避免等宽字体渲染问题）
-                        if es.is_emoji:
-                            es.code_block = False
-                            es.no_wrap = False
-                        segments.append(es)
+                    # 保留 code_block 属性；emoji 不设置 code_block（避免等宽字体渲染问题）
+                    style = seg.style_dict("is_emoji", "code_block", "no_wrap")
+                    for start, end, is_emoji, _ in self.emoji_handler.split_text_spans(seg.text):
+                        segments.append(TextSegment(text=seg.text[start:end], is_emoji=is_emoji,
+                                                    code_block=not is_emoji, no_wrap=not is_emoji, **style))
                     continue
 
                 if seg.text:
-                    emoji_subs = self.emoji_handler.split_text(seg.text)
-                    for es in emoji_subs:
-                        # Emoji 片段不继承 code 属性，避免等宽字体渲染问题
-                        es.bold = seg.bold
-                        es.italic = seg.italic
-                        es.strike = seg.strike
-                        es.code = False if es.is_emoji else seg.code
-
-                        # 行级/列表属性显式继承，避免 0 值被 or 短路污染
-                        es.heading = seg.heading
-                        es.quote = seg.quote
-                        es.code_block = seg.code_block
-                        es.horizontal_rule = seg.horizontal_rule
-                        es.list_item = seg.list_item
-                        es.list_ordered = seg.list_ordered
-                        es.list_level = seg.list_level
-                        es.list_index = seg.list_index
-                        es.list_continuation = seg.list_continuation
-
-                        segments.append(es)
+                    # 行级/列表与行内样式每个原片段只取一次模板；Emoji 片段不继承 code 属性，避免等宽字体渲染问题
+                    style = seg.style_dict("is_emoji", "no_wrap", "code")
+                    for start, end, is_emoji, no_wrap in self.emoji_handler.split_text_spans(seg.text):
+                        segments.append(TextSegment(text=seg.text[start:end], is_emoji=is_emoji, no_wrap=no_wrap,
+                                                    code=seg.code and not is_emoji, **style))
                 elif not seg.is_emoji:
                     segments.append(seg)
 
@@ -275,7 +431,7 @@ class TextRenderer:
 
                 if seg.code_block:
                     # 使用实际渲染宽度计算 code_block 文本宽度
-                    text_width = sum(self._get_char_render_width(font, c) for c in seg.text)
+                    text_width = sum(self._measure_chars(font, seg.text, False, width_tables))
                     if current_x + text_width > effective_width - 2 and current_x > 0:
                         if list_is_item:
                             if list_continuation_active:
@@ -305,7 +461,7 @@ class TextRenderer:
                     current_x += emoji_size
                 elif seg.no_wrap:
                     # 使用实际渲染宽度计算 no_wrap 文本宽度
-                    seg_width = sum(self._get_char_render_width(font, c) for c in seg.text)
+                    seg_width = sum(self._measure_chars(font, seg.text, False, width_tables))
                     if current_x + seg_width > effective_width - 2 and current_x > 0:
                         if list_is_item:
                             if list_continuation_active:
@@ -321,53 +477,54 @@ class TextRenderer:
                     # 确定用于计算宽度的字体
                     calc_font = font
                     if seg.heading:
-                        heading_size = int(real_font_size * (1.8 - seg.heading * 0.15))
-                        calc_font = self._load_font(heading_size)
+                        calc_font = heading_fonts[seg.heading]
                     elif seg.code or seg.code_block:
-                        code_font = self._load_mono_font(real_font_size)
-                        if code_font:
-                            calc_font = code_font
-
-                    chars = list(seg.text)
-                    for i, char in enumerate(chars):
-                        # 使用实际渲染宽度计算，避免字符右侧被裁切
-                        char_width = self._get_char_render_width(calc_font, char, seg.bold)
-                        # 添加 2px 安全余量，避免极端字符切边
-                        need_wrap = current_x + char_width > effective_width - 2 and current_x > 0
-                        if need_wrap and char in NO_LINE_START:
-                            need_wrap = False
-
-                        if not need_wrap and i == len(chars) - 2 and line_segments:
-                            next_char = chars[i + 1]
-                            next_width = self._get_char_render_width(calc_font, next_char, seg.bold)
-                            if current_x + char_width + next_width > effective_width - 2:
-                                render_items.append((line_segments, False, False, False, None))
-                                line_segments = []
-                                current_x = 0
-                                need_wrap = False
-
-                        if need_wrap:
-                            if list_is_item and list_continuation_active:
-                                for prev_seg, _ in line_segments:
-                                    prev_seg.list_continuation = True
-                            render_items.append((line_segments, False, False, False, None))
-                            line_segments = []
-                            current_x = 0
-                            if list_is_item:
-                                list_continuation_active = True
-                        line_segments.append((TextSegment(text=char,
-                                                           bold=seg.bold,
-                                                           italic=seg.italic,
-                                                           code=seg.code,
-                                                           strike=seg.strike,
-                                                           heading=seg.heading,
-                                                           quote=seg.quote,
-                                                           list_item=seg.list_item,
-                                                           list_ordered=seg.list_ordered,
-                                                           list_level=seg.list_level,
-                                                           list_index=seg.list_index,
-                                                           list_continuation=list_continuation_active), char_width))
-                        current_x += char_width
+                        if mono_font:
+                            calc_font = mono_font
+
+                    # 整段字符宽度一次算出（使用实际渲染宽度，避免字符右侧被裁切）
+                    widths = self._measure_chars(calc_font, seg.text, seg.bold, width_tables)
+                    # 添加 2px 安全余量，避免极端字符切边
+                    breaks, end_x = _find_wrap_points(seg.text, widths, current_x,
+                                                      bool(line_segments), effective_width - 2)
+
+                    # 同一行内的连续字符共用一个片段，绘制时再按字符宽度逐字定位
+                    start = 0
+                    for stop, lookahead in breaks + [(len(seg.text), None)]:
+                        if stop > start:
+                            run = TextSegment(text=seg.text[start:stop],
+                                              bold=seg.bold,
+                                              italic=seg.italic,
+                                              code=seg.code,
+                                              strike=seg.strike,
+                                              heading=seg.heading,
+                                              quote=seg.quote,
+                                              list_item=seg.list_item,
+                                              list_ordered=seg.list_ordered,
+                                              list_level=seg.list_level,
+                                              list_index=seg.list_index,
+                                              list_continuation=list_continuation_active)
+                            run_width = sum(widths[start:stop])
+                            prev = line_segments[-1][0] if line_segments else None
+                            if (prev is not None and prev.style_key == run.style_key
+                                    and prev.list_continuation == run.list_continuation):
+                                # 与行内前一片段样式相同（如分隔符拆分产生的相邻片段）则直接并入
+                                prev.text += run.text
+                                line_segments[-1] = (prev, line_segments[-1][1] + run_width)
+                            else:
+                                line_segments.append((run, run_width))
+                        if lookahead is None:
+                            break
+                        # 前瞻换行只提前断行，不标记列表延续
+                        if not lookahead and list_is_item and list_continuation_active:
+                            for prev_seg, _ in line_segments:
+                                prev_seg.list_continuation = True
+                        render_items.append((line_segments, False, False, False, None))
+                        line_segments = []
+                        if not lookahead and list_is_item:
+                            list_continuation_active = True
+                        start = stop
+                    current_x = end_x
 
             if line_segments:
                 if list_is_item and list_continuation_active:
@@ -375,119 +532,104 @@ class TextRenderer:
                         prev_seg.list_continuation = True
                 render_items.append((line_segments, False, False, False, None))
 
-        # 计算画布高度
-        total_height = 0
-        for segments, is_empty, is_table, is_hr, _ in render_items:
+        # 逐行计算布局与行高，绘制阶段直接复用
+        line_infos: List[LineRenderInfo] = []
+        min_content_width = max(20, emoji_size)
+        for segments, is_empty, is_table, is_hr, table_data in render_items:
             if is_hr:
-                total_height += int(line_pixel_height * 0.8)
-            elif is_table:
-                table_h = self._calc_table_height(_, line_pixel_height, font,
-                                                  text_area_width, scale)
-                total_height += table_h
-            elif is_empty:
-                total_height += int(line_pixel_height * 0.5)
-            else:
-                line_h = line_pixel_height
-                if any(seg.code_block for seg, _ in segments):
-                    line_h = int(line_pixel_height * 0.8)
+                line_infos.append(LineRenderInfo(height=int(line_pixel_height * 0.8), is_hr=True))
+                continue
+            if is_table:
+                table_layout = self._layout_table(table_data, line_pixel_height, font,
+                                                  text_area_width, scale) if table_data else None
+                table_h = self._calc_table_height(table_data, line_pixel_height, font,
+                                                  text_area_width, scale, table_layout)
+                line_infos.append(LineRenderInfo(height=table_h, is_table=True, table_data=table_data,
+                                                 table_layout=table_layout))
+                continue
+            if is_empty:
+                line_infos.append(LineRenderInfo(height=int(line_pixel_height * 0.5), is_empty=True))
+                continue
+
+            line_layout = self._build_line_layout(
+                segments=[seg for seg, _ in segments],
+                text_area_width=text_area_width,
+                font=font,
+                scale=scale,
+                min_content_width=min_content_width,
+            )
 
+            is_code_line = any(seg.code_block for seg, _ in segments)
+            has_emoji = any(seg.is_emoji for seg, _ in segments)
+            if is_code_line:
+                line_h = int(line_pixel_height * 0.8)
+            else:
                 # 计算该行中的最大字体高度（用于标题行自适应）
                 max_font_height = font_height
-                has_emoji = any(seg.is_emoji for seg, _ in segments)
                 for seg, _ in segments:
                     if seg.heading:
-                        heading_size = int(real_font_size * (1.8 - seg.heading * 0.15))
-                        heading_font = self._load_font(heading_size)
-                        h_height = self._get_font_height(heading_font, heading_size)
-                        max_font_height = max(max_font_height, h_height)
+                        max_font_height = max(max_font_height, heading_heights[seg.heading])
 
                 # 如果行中包含 emoji，确保行高能容纳 emoji
                 if has_emoji:
                     max_font_height = max(max_font_height, emoji_size)
 
-                # 如果最大字体高度大于基础字体高度，调整行高
+                line_h = line_pixel_height
+                # 如果最大字体高度大于基础字体高度，保持 line_height 系数，用最大字体高度重新计算（不小于原行高）
                 if max_font_height > font_height:
-                    # 保持 line_height 系数，用最大字体高度重新计算
-                    line_h = int(max_font_height * line_height)
-                    # 确保至少不小于原行高
-                    line_h = max(line_h, line_pixel_height)
+                    line_h = max(int(max_font_height * line_height), line_pixel_height)
+
+            line_infos.append(LineRenderInfo(segments=segments, height=line_h, layout=line_layout,
+                                             is_code_line=is_code_line, has_emoji=has_emoji))
 
-                total_height += line_h
+        canvas_height = sum(info.height for info in line_infos) + real_padding_y * 2
 
-        canvas_height = total_height + real_padding_y * 2
+        # 绘制前批量获取本次用到的 emoji（去重，未缓存的在下载线程池中并发下载），绘制阶段直接查表
+        emojis = [seg.text for info in line_infos if info.has_emoji
+                  for seg, _ in info.segments if seg.is_emoji]
+        emoji_images = self.emoji_handler.render_emojis(emojis, emoji_size) if emojis else {}
 
         # 创建画布
-        bg_rgb = self._hex_to_rgb(bg_color, "#ffffff")
-        text_rgb = self._hex_to_rgb(text_color, "#333333")
-        canvas = Image.new("RGBA", (real_width, canvas_height), (*bg_rgb, 255))
+        bg_rgb = _hex_to_rgb(str(bg_color), "#ffffff")
+        text_rgb = _hex_to_rgb(str(text_color), "#333333")
+        canvas = Image.new("RGB", (real_width, canvas_height), bg_rgb)
         draw = ImageDraw.Draw(canvas)
 
         # 绘制
         y = real_padding_y
-        for segments, is_empty, is_table, is_hr, table_data in render_items:
-            if is_hr:
+        for info in line_infos:
+            if info.is_hr:
                 # 绘制分割线
                 hr_y = y + int(line_pixel_height * 0.4)
                 draw.line([(content_left, hr_y), (content_right, hr_y)],
-                         fill=(200, 200, 200), width=2)
-                y += int(line_pixel_height * 0.8)
+                         fill=self._HR_COLOR, width=2)
+                y += info.height
                 continue
 
-            if is_table:
-                y = self._draw_table(draw, table_data, content_left, y, text_area_width,
-                                    font, real_font_size, line_pixel_height,
-                                    scale, text_rgb, bg_rgb)
+            if info.is_table:
+                y = self._draw_table(canvas, draw, info.table_data, content_left, y,
+                                    text_area_width, font, real_font_size, line_pixel_height,
+                                    scale, text_rgb, bg_rgb, info.table_layout)
                 continue
 
-            if is_empty:
-                y += int(line_pixel_height * 0.5)
+            if info.is_empty:
+                y += info.height
                 continue
 
-            is_code_line = any(seg.code_block for seg, _ in segments)
+            segments = info.segments
+            line_layout = info.layout
+            current_line_height = info.height
             is_list_continuation = any(seg.list_continuation for seg, _ in segments)
-
-            line_segments_only = [seg for seg, _ in segments]
-            line_layout = self._build_line_layout(
-                segments=line_segments_only,
-                text_area_width=text_area_width,
-                font=font,
-                scale=scale,
-                min_content_width=max(20, emoji_size),
-            )
             is_quote_line = line_layout["quote_offset"] > 0
             is_list_line = bool(line_layout["list_bullet_text"])
 
-            # 计算该行的实际行高和最大字体高度
-            current_line_height = line_pixel_height
-            max_font_height_in_line = font_height
-            has_emoji = any(seg.is_emoji for seg, _ in segments)
-
-            for seg, _ in segments:
-                if seg.heading:
-                    heading_size = int(real_font_size * (1.8 - seg.heading * 0.15))
-                    heading_font = self._load_font(heading_size)
-                    h_height = self._get_font_height(heading_font, heading_size)
-                    max_font_height_in_line = max(max_font_height_in_line, h_height)
-
-            # 如果行中包含 emoji，确保行高能容纳 emoji
-            if has_emoji:
-                max_font_height_in_line = max(max_font_height_in_line, emoji_size)
-
-            # 根据最大字体高度调整行高
-            if max_font_height_in_line > font_height:
-                current_line_height = int(max_font_height_in_line * line_height)
-                current_line_height = max(current_line_height, line_pixel_height)
-
-            if is_code_line:
-                current_line_height = int(line_pixel_height * 0.8)
-
             # 代码块背景
-            if is_code_line:
+            if info.is_code_line:
                 bg_x = content_left
                 bg_y = y - 2 * scale
                 bg_h = current_line_height + 4 * scale
-                draw.rounded_rectangle([bg_x, bg_y, content_right, bg_y + bg_h],
-                                     radius=4 * scale, fill=(245, 245, 245))
+                self._draw_rounded(draw, bg_x, bg_y, content_right, bg_y + bg_h,
+                                   4 * scale, self._BLOCK_BG)
 
             # 引用左边框
             quote_bar_width = line_layout["quote_bar_width"]
@@ -496,7 +638,7 @@ class TextRenderer:
                 bar_y = y
                 bar_h = current_line_height
                 draw.rectangle([bar_x, bar_y, bar_x + quote_bar_width, bar_y + bar_h],
-                             fill=(100, 149, 237))
+                             fill=self._QUOTE_BAR_COLOR)
 
             x = content_left + line_layout["quote_offset"]
 
@@ -512,14 +654,14 @@ class TextRenderer:
 
             for idx, (seg, w) in enumerate(segments):
                 if seg.is_emoji:
-                    emoji_img = self.emoji_handler.render_emoji(seg.text, emoji_size)
+                    emoji_img = emoji_images.get(seg.text)
                     if emoji_img:
                         emoji_y = y + (current_line_height - emoji_size) // 2
                         canvas.paste(emoji_img, (x, emoji_y), emoji_img)
                         x += w
                     else:
                         # Emoji 渲染失败时回退为文本绘制，确保至少显示字符且位置正确
-                        emoji_fallback_width = int(font.getlength(seg.text))
+                        emoji_fallback_width = self._get_advance_width(font, seg.text)
                         text_y = y + (current_line_height - font_height) // 2
                         draw.text((x, text_y), seg.text, font=font, fill=text_rgb)
                         x += emoji_fallback_width
@@ -527,19 +669,14 @@ class TextRenderer:
 
                 draw_font = font
                 draw_color = text_rgb
-                current_font_size = real_font_size
 
                 if seg.heading:
-                    current_font_size = int(real_font_size * (1.8 - seg.heading * 0.15))
-                    draw_font = self._load_font(current_font_size, bold=True)
-                    current_font_height = self._get_font_height(draw_font, current_font_size)
+                    draw_font = heading_fonts[seg.heading]
+                    current_font_height = heading_heights[seg.heading]
                 elif seg.code or seg.code_block:
-                    code_font = self._load_mono_font(real_font_size)
-                    if code_font:
-                        draw_font = code_font
-                        current_font_height = self._get_font_height(draw_font, real_font_size)
-                    else:
-                        current_font_height = font_height
+                    if mono_font:
+                        draw_font = mono_font
+                    current_font_height = mono_font_height
                 else:
                     current_font_height = font_height
 
@@ -563,33 +700,36 @@ class TextRenderer:
                         bg_y = text_y - 2 * scale
                         bg_w = run_width + pad * 2
                         bg_h = current_font_height + 4 * scale
-                        draw.rounded_rectangle([bg_x, bg_y, bg_x + bg_w, bg_y + bg_h],
-                                             radius=2 * scale, fill=(235, 235, 235))
-                    draw_color = (60, 60, 60)
+                        self._draw_rounded(draw, bg_x, bg_y, bg_x + bg_w, bg_y + bg_h,
+                                           2 * scale, self._CODE_BG)
+                    draw_color = self._CODE_COLOR
 
                 if seg.strike:
-                    draw_color = (160, 160, 160)
+                    draw_color = self._STRIKE_COLOR
 
                 if seg.italic and not seg.code and not seg.code_block:
-                    draw_color = (max(draw_color[0] - 20, 0),
-                                 max(draw_color[1] - 20, 0),
-                                 max(draw_color[2] - 20, 0))
+                    draw_color = _italic_color(draw_color)
 
                 if seg.quote:
-                    draw_color = (80, 80, 80)
+                    draw_color = self._QUOTE_COLOR
 
-                draw.text((x, text_y), seg.text, font=draw_font, fill=draw_color)
+                if seg.no_wrap or seg.code_block:
+                    # 不换行片段按整体宽度排版，整段绘制
+                    glyphs = ((seg.text, x),)
+                else:
+                    glyphs = self._layout_glyph_runs(draw_font, seg.text, x, seg.bold)
+
+                # 仿粗体用 1px 同色描边一次绘制完成，与宽度计算中的 +2px 补偿一致
+                stroke_width = 1 if seg.bold and not seg.code and not seg.code_block else 0
+                for glyph, glyph_x in glyphs:
+                    draw.text((glyph_x, text_y), glyph, font=draw_font, fill=draw_color,
+                              stroke_width=stroke_width, stroke_fill=draw_color)
 
                 if seg.strike:
                     strike_y = text_y + current_font_height // 2 - 1
                     draw.line([(x, strike_y), (x + w, strike_y)],
                              fill=draw_color, width=max(1, scale))
 
-                if seg.bold and not seg.code and not seg.code_block:
-                    for offset_x, offset_y in [(1, 0), (0, 1), (1, 1), (-1, 0), (0, -1)]:
-                        draw.text((x + offset_x, text_y + offset_y), seg.text,
-                                 font=draw_font, fill=draw_color)
-
                 x += w
 
             y += current_line_height
@@ -597,14 +737,18 @@ class TextRenderer:
         return self._save_image(canvas, bg_rgb)
 
     def _get_font_height(self, font: ImageFont.FreeTypeFont, fallback: int) -> int:
-        """安全获取字体高度"""
+        """安全获取字体高度（字体对象常驻缓存，度量按 id(font) 缓存）"""
+        cached = self._font_height_cache.get(id(font))
+        if cached is not None:
+            return cached
         try:
             ascent, descent = font.getmetrics()
             if ascent is None or descent is None:
                 return fallback
-            return ascent + descent
         except Exception:
             return fallback
+        self._font_height_cache[id(font)] = ascent + descent
+        return ascent + descent
 
     def _build_line_layout(self,
                            segments: List[TextSegment],
@@ -613,8 +757,31 @@ class TextRenderer:
                            scale: int,
                            min_content_width: int) -> Dict[str, Any]:
         """统一计算行布局参数，确保换行与绘制阶段口径一致。"""
+        has_quote = False
+        has_list = False
+        for seg in segments:
+            has_quote = has_quote or seg.quote
+            has_list = has_list or seg.list_item
+        if not has_quote and not has_list:
+            plain_key = (text_area_width, scale)
+            plain_layout = self._plain_layout_cache.get(plain_key)
+            if plain_layout is None:
+                plain_layout = {
+                    "quote_bar_width": 3 * scale,
+                    "quote_offset": 0,
+                    "list_ordered": False,
+                    "list_level": 0,
+                    "list_index": 0,
+                    "list_bullet_text": "",
+                    "list_bullet_width": 0,
+                    "list_indent": 0,
+                    "effective_width": max(1, text_area_width),
+                }
+                self._plain_layout_cache[plain_key] = plain_layout
+            return plain_layout
+
         quote_bar_width = 3 * scale
-        quote_offset = quote_bar_width + 4 * scale if any(seg.quote for seg in segments) else 0
+        quote_offset = quote_bar_width + 4 * scale if has_quote else 0
 
         list_ordered = False
         list_level = 0
@@ -628,7 +795,7 @@ class TextRenderer:
                 list_level = max(0, seg.list_level)
                 list_index = max(0, seg.list_index)
                 list_bullet_text = f"{list_index}." if list_ordered else "•"
-                list_bullet_width = sum(self._get_char_render_width(font, c) for c in list_bullet_text) + int(font.getlength(" "))
+                list_bullet_width = sum(self._get_char_render_width(font, c) for c in list_bullet_text) + self._get_advance_width(font, " ")
                 break
 
         list_indent_per_level = 20 * scale
@@ -670,7 +837,7 @@ class TextRenderer:
         cache_key = (id(font), char, is_bold)
         cached = self._char_width_cache.get(cache_key)
         if cached is not None:
-            self._char_width_cache.move_to_end(cache_key)
+            self._touch_char_width(cache_key)
             return cached
 
         try:
@@ -684,15 +851,94 @@ class TextRenderer:
         except Exception:
             width = int(font.getlength(char))
 
-        # 粗体补偿：粗体绘制时使用多次偏移（±1 像素），需要额外空间
+        # 粗体补偿：粗体绘制时使用 1px 描边（左右各 1 像素），需要额外空间
         if is_bold:
             width += 2
 
+        self._remember_char_width(cache_key, width)
+        return width
+
+    def _measure_chars(self, font: ImageFont.FreeTypeFont, text: str, is_bold: bool,
+                       width_tables: Dict[Tuple[int, bool], Dict[str, int]]) -> List[int]:
+        """逐字符返回渲染宽度
+
+        width_tables 为单次渲染内按 (id(font), is_bold) 划分的字符宽度表，命中时只需一次 dict 查找，
+        未命中再回退到带淘汰的全局缓存（中文正文常用字有限，几乎全部命中）。
+        """
+        table_key = (id(font), is_bold)
+        width_table = width_tables.get(table_key)
+        if width_table is None:
+            width_table = width_tables[table_key] = {}
+
+        widths: List[int] = []
+        for char in text:
+            width = width_table.get(char)
+            if width is None:
+                width = width_table[char] = self._get_char_render_width(font, char, is_bold)
+            widths.append(width)
+        return widths
+
+    def _get_advance_width(self, font: ImageFont.FreeTypeFont, text: str) -> int:
+        """获取字符或短文本的 advance 宽度（int(font.getlength(text))），与渲染宽度共用缓存"""
+        cache_key = (id(font), text, "adv")
+        cached = self._char_width_cache.get(cache_key)
+        if cached is not None:
+            self._touch_char_width(cache_key)
+            return cached
+
+        width = int(font.getlength(text))
+        self._remember_char_width(cache_key, width)
+        return width
+
+    def _touch_char_width(self, cache_key: Tuple[int, str, Any]):
+        """标记字符宽度为最近使用
+
+        该缓存位于逐字符热路径上不加锁：单个 OrderedDict 操作本身是原子的，
+        两步之间被其他渲染线程淘汰时忽略即可。
+        """
+        try:
+            self._char_width_cache.move_to_end(cache_key)
+        except KeyError:
+            pass
+
+    def _remember_char_width(self, cache_key: Tuple[int, str, Any], width: int):
+        """写入字符宽度缓存并控制上限（并发淘汰时容忍键已不存在）"""
         self._char_width_cache[cache_key] = width
-        self._char_width_cache.move_to_end(cache_key)
+        self._touch_char_width(cache_key)
         if len(self._char_width_cache) > self._char_width_cache_limit:
-            self._char_width_cache.popitem(last=False)
-        return width
+            try:
+                self._char_width_cache.popitem(last=False)
+            except KeyError:
+                pass
+
+    def _layout_glyph_runs(self, font: ImageFont.FreeTypeFont, text: str, x: int,
+                           is_bold: bool = False) -> List[Tuple[str, int]]:
+        """按换行阶段的字符渲染宽度定位，并将可整段绘制的连续字符合并
+
+        渲染宽度等于 advance 宽度的字符，整段绘制时字形位置与逐字定位一致，
+        合并后一次 draw.text 即可；其余字符（含粗体补偿）仍单独定位。
+
+        Returns:
+            [(文本, x 坐标)]
+        """
+        glyphs: List[Tuple[str, int]] = []
+        batch: List[str] = []
+        batch_x = x
+        for char in text:
+            char_width = self._get_char_render_width(font, char, is_bold)
+            if char_width == self._get_advance_width(font, char):
+                if not batch:
+                    batch_x = x
+                batch.append(char)
+            else:
+                if batch:
+                    glyphs.append((''.join(batch), batch_x))
+                    batch = []
+                glyphs.append((char, x))
+            x += char_width
+        if batch:
+            glyphs.append((''.join(batch), batch_x))
+        return glyphs
 
     def _wrap_text_segments_for_render(
             self,
@@ -701,15 +947,46 @@ class TextRenderer:
             mono_font: Optional[ImageFont.FreeTypeFont],
             max_width: int,
     ) -> List[List[Tuple[TextSegment, int]]]:
-        """将带样式的片段按宽度换行（用于卡片渲染）"""
+        """将带样式的片段按宽度换行（用于卡片渲染）
+
+        结果按 (字体, 宽度, 片段文本与样式) 缓存，重复的单元格内容直接复用；
+        返回的行列表与片段为共享对象，调用方只读不改。
+        """
+        cache_key = (id(font), id(mono_font), max_width,
+                     tuple((seg.text, seg.bold, seg.italic, seg.code, seg.strike) for seg in segments))
+        with self._shape_cache_lock:
+            cached = self._card_wrap_cache.get(cache_key)
+            if cached is not None:
+                self._card_wrap_cache.move_to_end(cache_key)
+                return cached
+
+        lines = self._wrap_card_segments(segments, font, mono_font, max_width)
+        with self._shape_cache_lock:
+            self._card_wrap_cache[cache_key] = lines
+            self._card_wrap_cache.move_to_end(cache_key)
+            if len(self._card_wrap_cache) > 512:
+                self._card_wrap_cache.popitem(last=False)
+        return lines
+
+    def _wrap_card_segments(
+            self,
+            segments: List[TextSegment],
+            font: ImageFont.FreeTypeFont,
+            mono_font: Optional[ImageFont.FreeTypeFont],
+            max_width: int,
+    ) -> List[List[Tuple[TextSegment, int]]]:
+        """_wrap_text_segments_for_render 的实际换行计算（不经缓存）"""
         if max_width <= 0:
-            line = [(seg, int((mono_font or font).getlength(seg.text)))
+            line = [(seg, self._get_advance_width(mono_font or font, seg.text))
                     for seg in segments if seg.text]
             return [line] if line else [[]]
 
         lines: List[List[Tuple[TextSegment, int]]] = []
         current: List[Tuple[TextSegment, int]] = []
         current_width = 0
+        no_line_start = NO_LINE_START
+        # 添加 2px 安全余量
+        limit = max_width - 2
 
         for seg in segments:
             text = seg.text or ""
@@ -717,30 +994,32 @@ class TextRenderer:
                 continue
 
             calc_font = mono_font or font if seg.code else font
-
-            for char in text:
-                # 同时考虑渲染宽度与 advance 宽度，避免相邻背景覆盖字符
-                render_width = self._get_char_render_width(calc_font, char, seg.bold)
-                advance_width = int(calc_font.getlength(char))
-                char_width = max(render_width, advance_width)
-                # 添加 2px 安全余量
-                need_wrap = current and (current_width + char_width > max_width - 2)
-                if need_wrap and char in NO_LINE_START:
-                    need_wrap = False
-
-                if need_wrap:
+            style = {"bold": seg.bold, "italic": seg.italic, "code": seg.code, "strike": seg.strike}
+
+            # 同时考虑渲染宽度与 advance 宽度，避免相邻背景覆盖字符
+            widths = [max(self._get_char_render_width(calc_font, char, seg.bold),
+                          self._get_advance_width(calc_font, char)) for char in text]
+            cum = list(accumulate(widths, initial=0))
+            count = len(text)
+            pos = 0
+            while pos < count:
+                # 二分定位放入当前行后第一个越界的字符，其前面的字符整体放入当前行
+                idx = bisect_right(cum, limit - current_width + cum[pos], pos + 1) - 1
+                stop = min(idx, count)
+                for i in range(pos, stop):
+                    current.append((TextSegment(text=text[i], **style), widths[i]))
+                current_width += cum[stop] - cum[pos]
+                if stop == count:
+                    break
+
+                # 越界字符：当前行已有内容且不是避头标点时换行
+                if current and text[idx] not in no_line_start:
                     lines.append(current)
                     current = []
                     current_width = 0
-
-                current.append((TextSegment(
-                    text=char,
-                    bold=seg.bold,
-                    italic=seg.italic,
-                    code=seg.code,
-                    strike=seg.strike,
-                ), char_width))
-                current_width += char_width
+                current.append((TextSegment(text=text[idx], **style), widths[idx]))
+                current_width += widths[idx]
+                pos = idx + 1
 
         if current:
             lines.append(current)
@@ -750,12 +1029,13 @@ class TextRenderer:
 
         return lines
 
-    def _calc_table_height(self, table_data: List[TableRow], line_height, font,
-                           content_width: int, scale: int) -> int:
-        """计算表格高度（卡片式布局）"""
-        if not table_data:
-            return line_height
+    def _layout_table(self, table_data: List[TableRow], line_height, font,
+                      content_width: int, scale: int) -> TableLayout:
+        """表格卡片排版：逐行换行一次，结果供高度计算与绘制共用
 
+        Returns:
+            [(数据行, 换行后的行列表, 卡片高度)]
+        """
         headers: List[str] = []
         data_rows: List[TableRow] = []
         max_cols = 0
@@ -772,154 +1052,140 @@ class TextRenderer:
         if not headers:
             headers = [f"字段{i + 1}" for i in range(max_cols)]
 
-        available_width = max(1, content_width)
         bar_width = max(1, int(4 * scale))
         card_padding = int(10 * scale)
-        card_margin = 0
-        card_content_width = max(1, available_width - card_padding * 2 - bar_width)
+        card_content_width = max(1, max(1, content_width) - card_padding * 2 - bar_width)
+        mono_font = self._load_mono_font(getattr(font, "size", None) or 0)
+
+        # 各列标签片段所有数据行共用（换行时只读取，不修改）
+        label_segments = [TextSegment(text=f"{label}：") for label in headers]
+        label_segments += [TextSegment(text=f"字段{col_idx + 1}：")
+                           for col_idx in range(len(headers), max_cols)]
 
-        total_height = 0
+        cards: TableLayout = []
         for row in data_rows:
-            line_count = 0
+            lines: List[List[Tuple[TextSegment, int]]] = []
             for col_idx, cell in enumerate(row.cells):
-                label = headers[col_idx] if col_idx < len(headers) else f"字段{col_idx + 1}"
+                label_segment = label_segments[col_idx]
                 value_segments = cell.segments
-                value_text = "".join(seg.text for seg in value_segments if seg.text).strip()
-                if value_text:
-                    label_segment = TextSegment(text=f"{label}：")
+                # 任一片段含非空白字符即视为有内容，找到即停
+                has_value = any(seg.text and not seg.text.isspace() for seg in value_segments)
+                if has_value:
                     line_segments = [label_segment] + value_segments
                 else:
-                    line_segments = [TextSegment(text=f"{label}：")]
+                    line_segments = [label_segment]
 
-                line_count += len(self._wrap_text_segments_for_render(
+                lines.extend(self._wrap_text_segments_for_render(
                     line_segments,
                     font,
-                    self._load_mono_font(getattr(font, "size", None) or 0),
+                    mono_font,
                     card_content_width,
                 ))
 
-            if line_count == 0:
-                line_count = 1
+            if not lines:
+                lines = [[]]
 
-            total_height += line_count * line_height + card_padding * 2
+            cards.append((row, lines, len(lines) * line_height + card_padding * 2))
+        return cards
 
-        if len(data_rows) > 1:
-            total_height += card_margin * (len(data_rows) - 1)
+    def _calc_table_height(self, table_data: List[TableRow], line_height, font,
+                           content_width: int, scale: int,
+                           table_layout: Optional[TableLayout] = None) -> int:
+        """计算表格高度（卡片式布局）"""
+        if not table_data:
+            return line_height
 
-        return total_height
+        if table_layout is None:
+            table_layout = self._layout_table(table_data, line_height, font, content_width, scale)
+        return sum(card_height for _, _, card_height in table_layout)
 
-    def _draw_table(self, draw, table_data: List[TableRow], x, y, content_width,
+    def _draw_table(self, image: Image.Image, draw, table_data: List[TableRow], x, y, content_width,
                    font, font_size, line_height, scale,
-                   text_rgb, bg_rgb) -> int:
-        """绘制表格（卡片式布局）"""
+                   text_rgb, bg_rgb,
+                   table_layout: Optional[TableLayout] = None) -> int:
+        """绘制表格（卡片式布局）
+
+        image 为 draw 所绑定的画布，卡片底色与左侧竖条以预合成的印章一次贴上；
+        table_layout 为 _layout_table 的结果，未提供时现算。
+        """
         if not table_data:
             return y
 
-        headers: List[str] = []
-        data_rows: List[TableRow] = []
-        max_cols = 0
-        for row in table_data:
-            max_cols = max(max_cols, len(row.cells))
-            if row.is_header and not headers:
-                headers = [cell.text for cell in row.cells]
-            else:
-                data_rows.append(row)
-
-        if not data_rows:
-            data_rows = table_data
-
-        if not headers:
-            headers = [f"字段{i + 1}" for i in range(max_cols)]
+        if table_layout is None:
+            table_layout = self._layout_table(table_data, line_height, font, content_width, scale)
 
         available_width = max(1, content_width)
         bar_width = max(1, int(4 * scale))
         card_padding = int(10 * scale)
         card_margin = 0
-        card_content_width = max(1, available_width - card_padding * 2 - bar_width)
-
-        bar_color = (100, 149, 237)
-        card_bg = (245, 245, 245)
+        card_radius = 6 * scale
+        # 行内代码背景与删除线的尺寸在整张表格内不变，提前算好供逐片段循环使用
+        code_pad = max(1, int(2 * scale))
+        code_bg_inset = 2 * scale
+        code_bg_extra = 4 * scale
+        code_radius = 2 * scale
+        strike_line_width = max(1, scale)
 
         current_y = y
         mono_font = self._load_mono_font(getattr(font, "size", None) or 0)
+        # 字体高度在整张表格内不变，提前取出供逐片段定位使用
+        font_height = self._get_font_height(font, line_height)
+        mono_font_height = self._get_font_height(mono_font, line_height) if mono_font else font_height
 
-        for row in data_rows:
-            lines: List[List[Tuple[TextSegment, int]]] = []
-            for col_idx, cell in enumerate(row.cells):
-                label = headers[col_idx] if col_idx < len(headers) else f"字段{col_idx + 1}"
-                value_segments = cell.segments
-                value_text = "".join(seg.text for seg in value_segments if seg.text).strip()
-                if value_text:
-                    label_segment = TextSegment(text=f"{label}：")
-                    line_segments = [label_segment] + value_segments
-                else:
-                    line_segments = [TextSegment(text=f"{label}：")]
-
-                lines.extend(self._wrap_text_segments_for_render(
-                    line_segments,
-                    font,
-                    mono_font,
-                    card_content_width,
-                ))
-
-            if not lines:
-                lines = [[]]
-
-            card_height = len(lines) * line_height + card_padding * 2
-
-            draw.rounded_rectangle(
-                [x, current_y, x + available_width, current_y + card_height],
-                radius=6 * scale,
-                fill=card_bg,
-            )
-
-            draw.rectangle(
-                [x, current_y, x + bar_width, current_y + card_height],
-                fill=bar_color,
-            )
+        for _, lines, card_height in table_layout:
+            stamp, stamp_mask = self._get_card_stamp(available_width, card_height,
+                                                     card_radius, bar_width)
+            image.paste(stamp, (x, current_y), stamp_mask)
 
             line_y = current_y + card_padding
             text_x = x + bar_width + card_padding
             for line in lines:
-                draw_x = text_x
+                if not any(seg.code or seg.bold or seg.italic or seg.strike for seg, _ in line):
+                    # 纯文本行（常见的“字段：值”）无背景、删除线与样式切换，走专用路径直接绘制
+                    self._draw_plain_card_line(draw, line, text_x,
+                                               line_y + (line_height - font_height) // 2,
+                                               font, text_rgb)
+                    line_y += line_height
+                    continue
+
                 backgrounds = []
                 text_ops = []
 
-                idx = 0
-                while idx < len(line):
-                    seg, w = line[idx]
+                # 按字段整行取出片段属性（结构数组），循环内按下标读取
+                texts = [seg.text for seg, _ in line]
+                codes = [seg.code for seg, _ in line]
+                bolds = [seg.bold for seg, _ in line]
+                italics = [seg.italic for seg, _ in line]
+                strikes = [seg.strike for seg, _ in line]
+
+                runs = _table_line_runs([w for _, w in line], codes, text_x)
+                for start, end, draw_x, w in runs:
+                    is_code = codes[start]
+                    is_bold = bolds[start]
+                    is_strike = strikes[start]
+                    text = texts[start]
                     draw_font = font
                     draw_color = text_rgb
-                    current_font_height = self._get_font_height(font, line_height)
+                    current_font_height = font_height
 
-                    if seg.code:
+                    if is_code:
                         if mono_font:
                             draw_font = mono_font
-                            current_font_height = self._get_font_height(draw_font, line_height)
-                    if seg.italic and not seg.code:
-                        draw_color = (max(draw_color[0] - 20, 0),
-                                      max(draw_color[1] - 20, 0),
-                                      max(draw_color[2] - 20, 0))
-                    if seg.strike:
-                        draw_color = (160, 160, 160)
+                            current_font_height = mono_font_height
+                    if italics[start] and not is_code:
+                        draw_color = _italic_color(draw_color)
+                    if is_strike:
+                        draw_color = self._STRIKE_COLOR
 
                     seg_y = line_y + (line_height - current_font_height) // 2
 
-                    if seg.code:
-                        run_text = seg.text
-                        run_width = w
-                        next_idx = idx + 1
-                        while next_idx < len(line) and line[next_idx][0].code:
-                            next_seg, next_w = line[next_idx]
-                            run_text += next_seg.text
-                            run_width += next_w
-                            next_idx += 1
+                    if is_code:
+                        run_text = "".join(texts[start:end])
 
-                        pad = max(1, int(2 * scale))
-                        bg_x = draw_x - pad
-                        bg_y = seg_y - 2 * scale
-                        bg_w = run_width + pad * 2
-                        bg_h = current_font_height + 4 * scale
+                        bg_x = draw_x - code_pad
+                        bg_y = seg_y - code_bg_inset
+                        bg_w = w + code_pad * 2
+                        bg_h = current_font_height + code_bg_extra
                         backgrounds.append((bg_x, bg_y, bg_w, bg_h))
 
                         text_ops.append({
@@ -927,58 +1193,154 @@ class TextRenderer:
                             "x": draw_x,
                             "y": seg_y,
                             "font": draw_font,
-                            "color": (60, 60, 60),
+                            "color": self._CODE_COLOR,
                             "bold": False,
-                            "strike": seg.strike,
-                            "width": run_width,
+                            "strike": is_strike,
+                            "width": w,
                             "code": True,
+                            "batchable": False,
                         })
-
-                        draw_x += run_width
-                        idx = next_idx
                         continue
 
-                    text_ops.append({
-                        "text": seg.text,
-                        "x": draw_x,
-                        "y": seg_y,
-                        "font": draw_font,
-                        "color": draw_color,
-                        "bold": seg.bold,
-                        "strike": seg.strike,
-                        "width": w,
-                        "code": False,
-                    })
-
-                    draw_x += w
-                    idx += 1
+                    # 宽度恰为 advance 的单字可整段绘制，与前一同样式文本合并为一次 draw.text
+                    batchable = (len(text) == 1
+                                 and w == self._get_advance_width(draw_font, text)
+                                 and w == self._get_char_render_width(draw_font, text, is_bold))
+                    prev_op = text_ops[-1] if text_ops else None
+                    if (batchable and prev_op is not None and prev_op["batchable"]
+                            and prev_op["font"] is draw_font and prev_op["color"] == draw_color
+                            and prev_op["bold"] == is_bold and prev_op["strike"] == is_strike
+                            and prev_op["y"] == seg_y and prev_op["x"] + prev_op["width"] == draw_x):
+                        prev_op["text"] += text
+                        prev_op["width"] += w
+                    else:
+                        text_ops.append({
+                            "text": text,
+                            "x": draw_x,
+                            "y": seg_y,
+                            "font": draw_font,
+                            "color": draw_color,
+                            "bold": is_bold,
+                            "strike": is_strike,
+                            "width": w,
+                            "code": False,
+                            "batchable": batchable,
+                        })
 
                 for bg_x, bg_y, bg_w, bg_h in backgrounds:
-                    draw.rounded_rectangle([bg_x, bg_y, bg_x + bg_w, bg_y + bg_h],
-                                         radius=2 * scale, fill=(235, 235, 235))
+                    self._draw_rounded(draw, bg_x, bg_y, bg_x + bg_w, bg_y + bg_h,
+                                       code_radius, self._CODE_BG)
 
+                # 首尾相接、同高同色的删除线合并为一条，在遇到其他文本前画出以保持叠放顺序
+                strike_span = None  # (x0, x1, y, color)
                 for op in text_ops:
-                    draw.text((op["x"], op["y"]), op["text"], font=op["font"], fill=op["color"])
-
-                    if op["bold"] and not op["code"]:
-                        for offset_x, offset_y in [(1, 0), (0, 1), (1, 1), (-1, 0), (0, -1)]:
-                            draw.text((op["x"] + offset_x, op["y"] + offset_y), op["text"],
-                                     font=op["font"], fill=op["color"])
+                    strike_y = op["y"] + current_font_height // 2 - 1
+                    continues_span = (op["strike"] and strike_span is not None
+                                      and strike_span[1] == op["x"] and strike_span[2] == strike_y
+                                      and strike_span[3] == op["color"])
+                    if strike_span is not None and not continues_span:
+                        x0, x1, span_y, span_color = strike_span
+                        draw.line([(x0, span_y), (x1, span_y)], fill=span_color, width=strike_line_width)
+                        strike_span = None
+
+                    # 仿粗体用 1px 同色描边一次绘制完成
+                    stroke_width = 1 if op["bold"] and not op["code"] else 0
+                    draw.text((op["x"], op["y"]), op["text"], font=op["font"], fill=op["color"],
+                              stroke_width=stroke_width, stroke_fill=op["color"])
 
                     if op["strike"]:
-                        strike_y = op["y"] + current_font_height // 2 - 1
-                        draw.line([(op["x"], strike_y), (op["x"] + op["width"], strike_y)],
-                                 fill=op["color"], width=max(1, scale))
+                        if strike_span is None:
+                            strike_span = (op["x"], op["x"] + op["width"], strike_y, op["color"])
+                        else:
+                            strike_span = (strike_span[0], op["x"] + op["width"], strike_y, op["color"])
+
+                if strike_span is not None:
+                    x0, x1, span_y, span_color = strike_span
+                    draw.line([(x0, span_y), (x1, span_y)], fill=span_color, width=strike_line_width)
 
                 line_y += line_height
 
             current_y += card_height + card_margin
 
         return current_y
+
+    def _draw_plain_card_line(self, draw, line: List[Tuple[TextSegment, int]], x: int, y: int,
+                              font: ImageFont.FreeTypeFont, color) -> None:
+        """绘制不含任何行内样式的卡片行
+
+        与通用路径的绘制结果一致：宽度恰为 advance 的单字与前一个同类字符合并为一次 draw.text，
+        其余字符按换行阶段的宽度单独定位。
+        """
+        glyphs: List[List[Any]] = []
+        prev_batchable = False
+        for seg, w in line:
+            text = seg.text
+            batchable = (len(text) == 1
+                         and w == self._get_advance_width(font, text)
+                         and w == self._get_char_render_width(font, text))
+            if batchable and prev_batchable:
+                glyphs[-1][0] += text
+            else:
+                glyphs.append([text, x])
+            prev_batchable = batchable
+            x += w
+
+        for text, glyph_x in glyphs:
+            draw.text((glyph_x, y), text, font=font, fill=color)
+
+    def _draw_rounded(self, draw, x0: int, y0: int, x1: int, y1: int, radius: int, fill) -> None:
+        """绘制实心圆角矩形，覆盖像素与 draw.rounded_rectangle([x0, y0, x1, y1]) 一致
+
+        同尺寸的圆角形状只光栅化一次并缓存为 1 位遮罩，之后用 draw.bitmap 直接贴色。
+        """
+        cache_key = (x1 - x0, y1 - y0, radius)
+        with self._shape_cache_lock:
+            mask = self._rounded_mask_cache.get(cache_key)
+        if mask is None:
+            mask = Image.new("1", (x1 - x0 + 1, y1 - y0 + 1), 0)
+            ImageDraw.Draw(mask).rounded_rectangle([0, 0, x1 - x0, y1 - y0], radius=radius, fill=1)
+            with self._shape_cache_lock:
+                if len(self._rounded_mask_cache) >= 128:
+                    self._rounded_mask_cache.pop(next(iter(self._rounded_mask_cache)), None)
+                self._rounded_mask_cache[cache_key] = mask
+        draw.bitmap((x0, y0), mask, fill=fill)
+
+    def _get_card_stamp(self, width: int, height: int, radius: int,
+                        bar_width: int) -> Tuple[Image.Image, Image.Image]:
+        """表格卡片印章：圆角底色上叠加左侧竖条，按遮罩贴到画布
+
+        像素与先画圆角矩形 [0, 0, width, height]、再画竖条矩形 [0, 0, bar_width, height] 一致；
+        竖条会盖住左侧圆角外的像素，因此遮罩取两者的并集。
+        """
+        cache_key = (width, height, radius, bar_width)
+        with self._shape_cache_lock:
+            cached = self._card_stamp_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        size = (width + 1, height + 1)
+        mask = Image.new("1", size, 0)
+        mask_draw = ImageDraw.Draw(mask)
+        mask_draw.rounded_rectangle([0, 0, width, height], radius=radius, fill=1)
+        mask_draw.rectangle([0, 0, bar_width, height], fill=1)
+
+        stamp = Image.new("RGB", size, self._BLOCK_BG)
+        ImageDraw.Draw(stamp).rectangle([0, 0, bar_width, height], fill=self._QUOTE_BAR_COLOR)
+
+        with self._shape_cache_lock:
+            if len(self._card_stamp_cache) >= 64:
+                self._card_stamp_cache.pop(next(iter(self._card_stamp_cache)), None)
+            self._card_stamp_cache[cache_key] = (stamp, mask)
+        return stamp, mask
+
     def _save_image(self, canvas, bg_rgb) -> str:
-        """保存图片"""
+        """保存图片（画布已是不透明 RGB 时直接编码，无需再合成一份）"""
         tmp = tempfile.NamedTemporaryFile(prefix="text2img_", suffix=".jpg", delete=False)
-        canvas_rgb = Image.new("RGB", canvas.size, bg_rgb)
-        canvas_rgb.paste(canvas, mask=canvas.split()[3] if canvas.mode == 'RGBA' else None)
+        tmp.close()
+        if canvas.mode == "RGB":
+            canvas_rgb = canvas
+        else:
+            canvas_rgb = Image.new("RGB", canvas.size, bg_rgb)
+            canvas_rgb.paste(canvas, mask=canvas.getchannel("A") if canvas.mode == 'RGBA' else None)
         canvas_rgb.save(tmp.name, format="JPEG", quality=80)
         return tmp.name
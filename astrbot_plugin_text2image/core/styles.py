@@ -1,10 +1,10 @@
 """样式定义"""
 
-from dataclasses import dataclass
-from typing import Optional, List
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, List
 
 
-@dataclass
+@dataclass(slots=True)
 class TextSegment:
     """文本片段"""
     text: str
@@ -28,6 +28,21 @@ class TextSegment:
     list_continuation: bool = False  # 是否列表换行延续
     is_newline: bool = False      # 是否强制换行
 
+    @property
+    def style_key(self) -> tuple:
+        """可比较的样式元组，相邻片段样式相同时可合并"""
+        return (self.heading, self.quote, self.code_block, self.horizontal_rule,
+                self.bold, self.italic, self.code, self.strike,
+                self.list_item, self.list_ordered, self.list_level, self.list_index,
+                self.list_continuation, self.is_emoji, self.no_wrap)
+
+    def style_dict(self, *exclude: str) -> Dict[str, Any]:
+        """导出除 text 与 exclude 外的字段，作为批量派生同样式片段的构造参数模板"""
+        return {name: getattr(self, name) for name in _STYLE_FIELDS if name not in exclude}
+
+
+_STYLE_FIELDS = tuple(f.name for f in fields(TextSegment) if f.name != "text")
+
 
 @dataclass
 class TableCell:
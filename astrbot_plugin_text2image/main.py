@@ -10,7 +10,7 @@ import base64
 import os
 import threading
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Set, Tuple
 
 from astrbot.api import AstrBotConfig, logger
 from astrbot.api.event import AstrMessageEvent, filter
@@ -51,6 +51,9 @@ class Text2ImagePlugin(Star):
         self._renderer_lock = threading.Lock()
         self._renderer: Optional[TextRenderer] = None
         self._renderer_cfg_fp: Optional[tuple[Any, ...]] = None
+        # 各渲染器进行中的渲染数；被替换的旧渲染器等到无人使用后再在线程中关闭
+        self._renderer_users: Dict[TextRenderer, int] = {}
+        self._retired_renderers: Set[TextRenderer] = set()
 
         # 扫描 ziti 目录的字体文件
         self._available_fonts = self._scan_fonts()
@@ -83,19 +86,26 @@ class Text2ImagePlugin(Star):
             return available_fonts
         
         try:
-            for file_path in self._font_dir.iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in font_extensions:
-                    available_fonts.append(file_path.name)
+            # os.scandir 的目录项自带文件类型，判断 is_file 无需逐个 stat
+            with os.scandir(self._font_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in font_extensions:
+                        available_fonts.append(entry.name)
         except Exception as e:
             logger.warning(f"[text2image-x] 扫描字体目录失败: {e}")
         
         return sorted(available_fonts)
 
     async def terminate(self):
-        """插件卸载时取消所有撤回任务"""
+        """插件卸载时取消所有撤回任务并释放渲染器"""
         for task in self._recall_tasks:
             task.cancel()
         self._recall_tasks.clear()
+        with self._renderer_lock:
+            stale = self._retire_renderer_locked(self._renderer)
+            self._renderer = None
+            self._renderer_cfg_fp = None
+        await self._close_renderer(stale)
 
     def _schedule_recall(self, client, message_id: int):
         """安排撤回消息"""
@@ -133,26 +143,79 @@ class Text2ImagePlugin(Star):
             "emoji_cache_dir",
             "emoji_timeout",
             "emoji_failed_ttl",
+            "emoji_archive_prefetch",
             "hide_table_first_column_label",
         )
         return tuple(cfg.get(k) for k in keys)
 
-    def _get_renderer(self) -> TextRenderer:
+    def _acquire_renderer(self) -> Tuple[TextRenderer, Optional[TextRenderer]]:
+        """取得当前配置对应的渲染器并登记一次使用，用完后须调用 _release_renderer
+
+        Returns:
+            (渲染器, 因配置变更被替换且已无人使用、需要关闭的旧渲染器)
+        """
         cfg = self.cfg()
         cfg_fp = self._build_renderer_cfg_fp(cfg)
+        stale = None
         with self._renderer_lock:
             if self._renderer is None or self._renderer_cfg_fp != cfg_fp:
+                stale = self._retire_renderer_locked(self._renderer)
                 self._renderer = TextRenderer(cfg, self._font_dir)
                 self._renderer_cfg_fp = cfg_fp
-            return self._renderer
+            renderer = self._renderer
+            self._renderer_users[renderer] = self._renderer_users.get(renderer, 0) + 1
+        return renderer, stale
+
+    def _release_renderer(self, renderer: TextRenderer) -> Optional[TextRenderer]:
+        """结束一次使用；已被替换的渲染器在最后一次使用结束时返回，由调用方关闭"""
+        with self._renderer_lock:
+            users = self._renderer_users.get(renderer, 0) - 1
+            if users > 0:
+                self._renderer_users[renderer] = users
+                return None
+            self._renderer_users.pop(renderer, None)
+            if renderer in self._retired_renderers:
+                self._retired_renderers.discard(renderer)
+                return renderer
+            return None
+
+    def _retire_renderer_locked(self, renderer: Optional[TextRenderer]) -> Optional[TextRenderer]:
+        """标记渲染器不再使用（调用方需持有 _renderer_lock）
+
+        Returns:
+            无进行中的渲染、可立即关闭时返回该渲染器，否则留待最后一次使用结束后关闭
+        """
+        if renderer is None:
+            return None
+        if self._renderer_users.get(renderer, 0) == 0:
+            return renderer
+        self._retired_renderers.add(renderer)
+        return None
+
+    @staticmethod
+    async def _close_renderer(renderer: Optional[TextRenderer]):
+        """在线程中关闭渲染器，等待其下载任务结束时不阻塞事件循环"""
+        if renderer is None:
+            return
+        try:
+            await asyncio.to_thread(renderer.close)
+        except Exception as exc:
+            logger.warning("[text2image-x] 关闭渲染器失败: %s", exc)
 
     async def _render_async(self, text: str) -> Optional[str]:
         try:
-            renderer = self._get_renderer()
+            renderer, stale = self._acquire_renderer()
+        except Exception as exc:
+            logger.error("[text2image-x] 渲染失败: %s", exc)
+            return None
+        await self._close_renderer(stale)
+        try:
             return await asyncio.to_thread(renderer.render, text)
         except Exception as exc:
             logger.error("[text2image-x] 渲染失败: %s", exc)
             return None
+        finally:
+            await self._close_renderer(self._release_renderer(renderer))
 
     def _chain_to_plain_text(self, chain: list[Any]) -> Optional[str]:
         if not chain:
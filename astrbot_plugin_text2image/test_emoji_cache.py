@@ -8,6 +8,7 @@ Emoji 缓存功能测试脚本
 """
 
 import asyncio
+import os
 import sys
 from pathlib import Path
 
@@ -58,7 +59,6 @@ def test_emoji_cache():
             if result_path:
                 print(f"  ✓ 渲染成功: {result_path}")
                 # 清理临时文件
-                import os
                 os.remove(result_path)
             else:
                 print(f"  ✗ 渲染失败")
@@ -74,7 +74,6 @@ def test_emoji_cache():
             result_path = renderer.render(text)
             if result_path:
                 print(f"  ✓ 渲染成功（应来自缓存）: {result_path}")
-                import os
                 os.remove(result_path)
             else:
                 print(f"  ✗ 渲染失败")
@@ -86,11 +85,11 @@ def test_emoji_cache():
     print("-" * 60)
     cache_dir = Path(__file__).parent / ".emoji-cache"
     if cache_dir.exists():
-        files = list(cache_dir.glob("*.png"))
+        files = [entry.name for entry in os.scandir(cache_dir) if entry.name.endswith(".png")]
         print(f"缓存目录: {cache_dir}")
         print(f"缓存文件数: {len(files)}")
         if files:
-            print(f"示例文件: {files[0].name}")
+            print(f"示例文件: {files[0]}")
     else:
         print("缓存目录不存在")
 
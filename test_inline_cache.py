@@ -0,0 +1,60 @@
+"""测试行内样式解析缓存：重复解析返回新的片段对象"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from astrbot_plugin_text2image.core.markdown import _parse_inline_styles, parse_markdown, LineContext
+
+
+def test_inline_cache_returns_fresh_segments():
+    """缓存命中时修改返回片段不应影响后续解析"""
+    first = _parse_inline_styles("名称 **粗体** `代码`")
+    print("首次解析:", [(seg.text, seg.bold, seg.code) for seg in first])
+    for seg in first:
+        seg.list_item = True
+        seg.text = "被修改"
+
+    second = _parse_inline_styles("名称 **粗体** `代码`")
+    print("再次解析:", [(seg.text, seg.bold, seg.code) for seg in second])
+    assert [seg.text for seg in second] == ["名称 ", "粗体", " ", "代码"]
+    assert [seg.bold for seg in second] == [False, True, False, False]
+    assert second[3].code
+    assert not any(seg.list_item for seg in second)
+
+
+def test_table_cells_not_shared():
+    """相同单元格文本在不同行中解析出独立的片段"""
+    ctx = LineContext()
+    for line in ["| 状态 | 说明 |", "|---|---|", "| 正常 | **OK** |", "| 正常 | **OK** |"]:
+        parse_markdown(line, ctx)
+    rows = ctx.table_rows
+    assert rows[1].cells[1].segments[0] is not rows[2].cells[1].segments[0]
+    segments = parse_markdown("表格后", ctx)
+    print("表格序列化片段:", [seg.text for seg in segments])
+    assert [seg.text for seg in segments[:4]] == ["状态：", "正常", "说明：", "OK"]
+    assert all(seg.list_item for seg in segments[:4])
+
+
+def test_autoclose_cache_keeps_emphasis_state():
+    """同一行文本在不同跨行强调状态下解析结果不同，缓存命中时状态仍正确传递"""
+    ctx = LineContext()
+    results = []
+    for line in ["**开始", "中间", "结束**", "中间"]:
+        results.append([(seg.text, seg.bold) for seg in parse_markdown(line, ctx)])
+    print("跨行强调:", results)
+    assert results[1] == [("中间", True)]
+    assert results[3] == [("中间", False)]
+    assert not ctx.em_open_bold
+
+    first = parse_markdown("- 项目", LineContext())
+    first[0].bold = True
+    second = parse_markdown("- 项目", LineContext())
+    assert not second[0].bold and second[0].list_item
+
+
+if __name__ == "__main__":
+    test_inline_cache_returns_fresh_segments()
+    test_table_cells_not_shared()
+    test_autoclose_cache_keeps_emphasis_state()
@@ -0,0 +1,94 @@
+"""测试渲染器生命周期：渲染进行中修改配置不应关闭仍在使用的渲染器"""
+import asyncio
+import io
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image
+
+from astrbot_plugin_text2image.core.emoji import EmojiHandler
+from astrbot_plugin_text2image.main import Text2ImagePlugin
+
+
+def test_config_change_during_render():
+    """旧渲染器在进行中的渲染结束后才关闭，新渲染立即使用新配置"""
+    cfg = {"emoji_cache_dir": tempfile.mkdtemp(), "font_size": 24}
+    plugin = Text2ImagePlugin(None, cfg)
+    closed = []
+
+    async def scenario():
+        first, _ = plugin._acquire_renderer()
+        plugin._release_renderer(first)
+
+        started = threading.Event()
+        resume = threading.Event()
+        original_render = first.render
+
+        def blocking_render(text):
+            started.set()
+            resume.wait(10)
+            return original_render(text)
+
+        def recording_close():
+            closed.append(first)
+            type(first).close(first)
+
+        first.render = blocking_render
+        first.close = recording_close
+
+        slow = asyncio.create_task(plugin._render_async("旧配置"))
+        await asyncio.to_thread(started.wait, 10)
+
+        cfg["font_size"] = 30
+        fast_path = await plugin._render_async("新配置")
+        print("配置变更后渲染:", fast_path, "旧渲染器已关闭:", bool(closed))
+        assert fast_path
+        assert plugin._renderer is not first
+        assert not closed
+
+        resume.set()
+        slow_path = await slow
+        print("旧配置渲染:", slow_path, "旧渲染器已关闭:", bool(closed))
+        assert slow_path
+        assert closed == [first]
+        await plugin.terminate()
+        return fast_path, slow_path
+
+    for path in asyncio.run(scenario()):
+        Path(path).unlink(missing_ok=True)
+
+
+def test_render_emojis_after_close():
+    """处理器关闭后批量获取 emoji 回退为当前线程下载，不抛出异常"""
+    buf = io.BytesIO()
+    Image.new("RGBA", (72, 72), (255, 0, 0, 255)).save(buf, "PNG")
+
+    class FakeResponse:
+        content = buf.getvalue()
+
+        def raise_for_status(self):
+            pass
+
+    class FakeSession:
+        def get(self, url, timeout=None):
+            return FakeResponse()
+
+        def close(self):
+            pass
+
+    handler = EmojiHandler(cache_dir=Path(tempfile.mkdtemp()))
+    handler.close()
+    handler._session = FakeSession()
+    images = handler.render_emojis(["😀", "😁", "😂"], 32)
+    print("关闭后批量获取:", {emoji: img.size for emoji, img in images.items()})
+    assert all(img is not None and img.size == (32, 32) for img in images.values())
+
+
+if __name__ == "__main__":
+    test_config_change_during_render()
+    test_render_emojis_after_close()
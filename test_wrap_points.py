@@ -0,0 +1,52 @@
+"""测试逐字符换行核心 _find_wrap_points"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from astrbot_plugin_text2image.core.renderer import _find_wrap_points
+
+
+def test_segment_fits_without_breaks():
+    """整段放得下时不换行，返回累计宽度"""
+    breaks, end_x = _find_wrap_points(list("你好世界"), [10, 10, 10, 10], 20, True, 100)
+    print("整段放得下:", breaks, end_x)
+    assert breaks == []
+    assert end_x == 60
+
+
+def test_wrap_and_no_line_start():
+    """超宽时换行，避头标点不出现在行首"""
+    breaks, end_x = _find_wrap_points(list("一二三，四五"), [10] * 6, 0, False, 30)
+    print("换行点:", breaks, end_x)
+    # "，" 不能作为行首，跟随上一行；"四" 起新行后 "五" 与之同行
+    assert breaks == [(4, False)]
+    assert end_x == 20
+
+
+def test_last_pair_lookahead():
+    """末尾两个字符放不下时整体换到下一行"""
+    breaks, end_x = _find_wrap_points(list("ab"), [10, 10], 20, True, 35)
+    print("前瞻换行:", breaks, end_x)
+    assert breaks == [(0, True)]
+    assert end_x == 20
+
+    # 当前行没有片段时不做前瞻
+    breaks, _ = _find_wrap_points(list("ab"), [10, 10], 20, False, 35)
+    assert breaks == [(1, False)]
+
+
+def test_punctuation_before_last_char():
+    """倒数第二个字符为越界的避头标点时，末尾两字符按前瞻整体换行"""
+    breaks, end_x = _find_wrap_points(list("一，二"), [10, 10, 10], 0, False, 15)
+    print("标点前瞻换行:", breaks, end_x)
+    assert breaks == [(1, True), (2, False)]
+    assert end_x == 10
+
+
+if __name__ == "__main__":
+    test_segment_fits_without_breaks()
+    test_wrap_and_no_line_start()
+    test_last_pair_lookahead()
+    test_punctuation_before_last_char()